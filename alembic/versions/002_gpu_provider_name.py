@@ -0,0 +1,36 @@
+"""gpu provider name
+
+Revision ID: 002
+Create Date: 2026-10-15 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Cloud provider backing each spot GPU (e.g. 'sfcompute', 'vast', 'aws')
+    op.add_column('gpus', sa.Column('provider_name', sa.String(length=50)))
+
+    # Backfill from the provider-prefixed instance IDs of existing spot GPUs
+    op.execute(
+        """
+        UPDATE gpus SET provider_name = CASE
+            WHEN provider_id LIKE 'sfcompute%' THEN 'sfcompute'
+            WHEN provider_id LIKE 'vast%' THEN 'vast'
+            WHEN provider_id LIKE 'aws%' THEN 'aws'
+        END
+        WHERE provider = 'spot'
+        """
+    )
+
+    op.create_index('idx_gpus_provider_name', 'gpus', ['provider', 'provider_name'])
+
+def downgrade():
+    op.drop_index('idx_gpus_provider_name', table_name='gpus')
+    op.drop_column('gpus', 'provider_name')
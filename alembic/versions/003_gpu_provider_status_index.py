@@ -0,0 +1,20 @@
+"""gpu provider status index
+
+Revision ID: 003
+Create Date: 2026-10-15 10:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Serves spot monitoring's WHERE provider = 'spot' AND status IN (...)
+    op.create_index('idx_gpus_provider_status', 'gpus', ['provider', 'status'])
+
+def downgrade():
+    op.drop_index('idx_gpus_provider_status', table_name='gpus')
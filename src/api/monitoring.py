@@ -1,12 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, Any, List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import Dict, Any, List, Optional
+import asyncio
+import time
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 import psutil
 import logging
-from datetime import datetime
-from src.utils.gpu_metrics import get_formatted_gpu_metrics, initialize_nvml, shutdown_nvml, start_metrics_collection
+from src.utils import gpu_metrics
+from src.utils.timestamps import utc_isoformat
+from src.utils.cpu_sampler import get_cpu_percent, start_cpu_sampler
+from src.utils.gpu_metrics import initialize_nvml, start_metrics_collection
 
 logger = logging.getLogger(__name__)
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Requests read the shared sampler's latest value instead of moving
+# psutil's process-wide CPU baseline themselves
+start_cpu_sampler()
+
+# NVML calls serialize in the driver anyway; a dedicated worker keeps GPU
+# polls from occupying the shared threadpool used by other blocking I/O
+_nvml_exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nvml")
+
+# GPU metrics are shared between requests for a short TTL, and concurrent
+# misses wait on a single NVML poll
+GPU_METRICS_TTL = 0.5
+_gpu_metrics_value: Optional[Dict[str, Any]] = None
+_gpu_metrics_expiry = 0.0
+_gpu_metrics_inflight: Optional[asyncio.Task] = None
+
+async def _poll_gpu_metrics() -> Dict[str, Any]:
+    global _gpu_metrics_value, _gpu_metrics_expiry, _gpu_metrics_inflight
+    try:
+        # Looked up at call time so tests can patch the gpu_metrics module
+        loop = asyncio.get_running_loop()
+        value = await loop.run_in_executor(_nvml_exec, gpu_metrics.get_formatted_gpu_metrics)
+        _gpu_metrics_value = value
+        _gpu_metrics_expiry = time.monotonic() + GPU_METRICS_TTL
+        return value
+    finally:
+        _gpu_metrics_inflight = None
+
+async def get_cached_gpu_metrics() -> Dict[str, Any]:
+    """Get formatted GPU metrics, polling NVML at most once per TTL"""
+    global _gpu_metrics_inflight
+    if _gpu_metrics_value is not None and time.monotonic() < _gpu_metrics_expiry:
+        return _gpu_metrics_value
+    
+    task = _gpu_metrics_inflight
+    if task is None:
+        task = _gpu_metrics_inflight = asyncio.create_task(_poll_gpu_metrics())
+    # Shielded so one cancelled request doesn't cancel the poll for the rest
+    return await asyncio.shield(task)
+
+def reset_gpu_metrics_cache() -> None:
+    """Drop the cached GPU metrics"""
+    global _gpu_metrics_value, _gpu_metrics_expiry
+    _gpu_metrics_value = None
+    _gpu_metrics_expiry = 0.0
 
 @router.get("/health", response_model=Dict[str, Any])
 async def health_check():
@@ -14,7 +66,7 @@ async def health_check():
     try:
         return {
             "status": "healthy",
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": utc_isoformat(),
             "version": "1.0.0"
         }
     except Exception as e:
@@ -28,12 +80,12 @@ async def health_check():
 async def get_metrics():
     """Get system metrics"""
     try:
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_percent = get_cpu_percent()
         memory = psutil.virtual_memory()
         disk = psutil.disk_usage('/')
         
         return {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": utc_isoformat(),
             "system": {
                 "cpu_percent": cpu_percent,
                 "memory": {
@@ -61,7 +113,7 @@ async def get_gpu_metrics():
     """Get GPU metrics using NVML"""
     try:
         # Get GPU metrics using our new module
-        metrics = get_formatted_gpu_metrics()
+        metrics = await get_cached_gpu_metrics()
         return metrics
     except Exception as e:
         logger.error(f"Failed to get GPU metrics: {str(e)}")
@@ -70,6 +122,29 @@ async def get_gpu_metrics():
             detail=f"Failed to get GPU metrics: {str(e)}"
         )
 
+@router.get("/gpu-metrics/stream")
+async def stream_gpu_metrics(
+    interval: float = Query(1.0, ge=GPU_METRICS_TTL, le=60.0, description="Seconds between events")
+):
+    """Stream GPU metrics as Server-Sent Events over one connection"""
+    async def events():
+        while True:
+            try:
+                # Subscribers share the cached snapshot, so N streams cost
+                # one NVML poll per TTL
+                metrics = await get_cached_gpu_metrics()
+                yield b"data: " + orjson.dumps(metrics) + b"\n\n"
+            except Exception as e:
+                logger.error(f"Failed to get GPU metrics: {str(e)}")
+                yield b"event: error\ndata: " + orjson.dumps({"detail": str(e)}) + b"\n\n"
+            await asyncio.sleep(interval)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Initialize NVML when the module is loaded
 try:
     initialize_nvml()
@@ -79,6 +154,4 @@ try:
 except Exception as e:
     logger.error(f"Failed to initialize NVML: {str(e)}")
 
-# Ensure NVML is properly shut down when the application exits
-import atexit
-atexit.register(shutdown_nvml)
+# NVML shutdown at exit is registered once by src.utils.gpu_metrics
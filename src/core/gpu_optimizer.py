@@ -42,10 +42,15 @@ class GPUOptimizer:
         }
 
     @monitor
-    async def optimize_gpu_allocation(self, gpu: GPU) -> List[Job]:
+    async def optimize_gpu_allocation(
+        self,
+        gpu: GPU,
+        queued_jobs: Optional[List[Job]] = None
+    ) -> List[Job]:
         """Find optimal batch of jobs for a GPU"""
         available_memory = gpu.available_memory
-        queued_jobs = self._get_candidate_jobs()
+        if queued_jobs is None:
+            queued_jobs = self._get_candidate_jobs()
         
         if not queued_jobs:
             return []
@@ -194,19 +199,36 @@ class GPUOptimizer:
             GPU.status.in_([GPUStatus.AVAILABLE, GPUStatus.BUSY])
         ).all()
 
+        if not available_gpus:
+            return
+
+        # Fetch running jobs for all GPUs in one query instead of one per GPU
+        running_jobs = self.db.query(Job).filter(
+            Job.gpu_assigned.in_([gpu.id for gpu in available_gpus]),
+            Job.status == JobStatus.RUNNING
+        ).all()
+        jobs_by_gpu: Dict[str, List[Job]] = {}
+        for job in running_jobs:
+            jobs_by_gpu.setdefault(str(job.gpu_assigned), []).append(job)
+
+        # Load queued candidates once and share them across GPUs
+        queued_jobs = self._get_candidate_jobs()
+
         # Calculate current utilization
         for gpu in available_gpus:
-            current_jobs = self.db.query(Job).filter(
-                Job.gpu_assigned == gpu.id,
-                Job.status == JobStatus.RUNNING
-            ).all()
+            if not queued_jobs:
+                break
+
+            current_jobs = jobs_by_gpu.get(str(gpu.id), [])
 
             # Check if GPU is underutilized
             if self._is_gpu_underutilized(gpu, current_jobs):
                 # Try to find more jobs to add to this GPU
-                new_jobs = await self.optimize_gpu_allocation(gpu)
+                new_jobs = await self.optimize_gpu_allocation(gpu, queued_jobs=queued_jobs)
                 if new_jobs:
                     await self._migrate_jobs_to_gpu(new_jobs, gpu)
+                    migrated_ids = {job.id for job in new_jobs}
+                    queued_jobs = [job for job in queued_jobs if job.id not in migrated_ids]
 
     def _is_gpu_underutilized(self, gpu: GPU, current_jobs: List[Job]) -> bool:
         """Check if a GPU is significantly underutilized"""
@@ -1,6 +1,5 @@
 from typing import List, Optional, Dict, Any
 import logging
-from datetime import datetime
 
 from src.db.repository import Repository
 from src.models.domain import (
@@ -9,6 +8,8 @@ from src.models.domain import (
 )
 from src.core.gpu_allocator import GPUAllocator
 from src.utils.model_runner import ModelRunner
+from src.utils.timestamps import utc_isoformat
+from src.utils.monitoring import on_job_queued, on_job_started, on_job_completed
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +27,7 @@ class JobManager:
         try:
             # Create job in queued state
             created_job = await self.repo.create_job(job)
+            on_job_queued()
             logger.info(f"Created job {created_job.id} for organization {job.organization_id}")
             
             # Try to allocate GPU and start job immediately if possible
@@ -71,9 +73,10 @@ class JobManager:
                 job_id,
                 JobUpdate(
                     status=JobStatus.CANCELLED,
-                    completed_at=datetime.utcnow().isoformat()
+                    completed_at=utc_isoformat()
                 )
             )
+            on_job_completed(job.status)
             
             # Release GPU if job was running
             if job.status == JobStatus.RUNNING and job.gpu_id:
@@ -106,6 +109,7 @@ class JobManager:
                     gpu_id=gpu.id
                 )
             )
+            on_job_started()
             
             # Start job execution
             self._start_job_execution(job, gpu)
@@ -118,9 +122,10 @@ class JobManager:
                 JobUpdate(
                     status=JobStatus.FAILED,
                     error=f"Failed to allocate GPU: {str(e)}",
-                    completed_at=datetime.utcnow().isoformat()
+                    completed_at=utc_isoformat()
                 )
             )
+            on_job_completed(job.status)
     
     def _start_job_execution(self, job: JobResponse, gpu: Any) -> None:
         """Start job execution in background task"""
@@ -167,9 +172,10 @@ class JobManager:
                     status=status,
                     result=result,
                     error=error,
-                    completed_at=datetime.utcnow().isoformat()
+                    completed_at=utc_isoformat()
                 )
             )
+            on_job_completed(job.status)
             
             # Release GPU
             if job.gpu_id:
@@ -8,6 +8,8 @@ from contextlib import asynccontextmanager
 
 from src.api import jobs, gpus, monitoring
 from src.utils.monitoring import setup_monitoring
+from src.utils.db_pool import close_pg_pool
+from src.utils.supabase import get_supabase, get_supabase_admin, close_supabase
 from dotenv import load_dotenv
 from src.config import get_settings
 from src.config.utils import configure_logging, get_api_cors_origins, build_api_url, is_development_mode
@@ -24,6 +26,14 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Build the shared Supabase clients up front so the first request doesn't
+    # pay for client construction and every request reuses their pools
+    for get_client in (get_supabase, get_supabase_admin):
+        try:
+            get_client()
+        except Exception as e:
+            logger.warning(f"Supabase client not initialized: {e}")
+    
     # Start monitoring in the background if enabled
     if settings.monitoring.enable_prometheus:
         monitoring_task = asyncio.create_task(
@@ -43,6 +53,10 @@ async def lifespan(app: FastAPI):
             await monitoring_task
         except asyncio.CancelledError:
             pass
+    
+    # Close the shared database pool if anything opened it
+    await close_pg_pool()
+    close_supabase()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Boolean, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Boolean, Enum, Index
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.sql import func
 import enum
@@ -23,6 +23,7 @@ class GPU(Base):
     name = Column(String(255))  # e.g., "NVIDIA RTX 4090"
     provider = Column(String(50))  # 'base' or 'spot'
     provider_id = Column(String(255))  # Provider-specific ID
+    provider_name = Column(String(50), nullable=True)  # Spot cloud provider, e.g. 'sfcompute'
     
     status = Column(String(50), default=GPUStatus.AVAILABLE)
     total_memory = Column(Integer)  # in MB
@@ -38,6 +39,11 @@ class GPU(Base):
     spot_request_id = Column(String(255), nullable=True)
     termination_time = Column(DateTime(timezone=True), nullable=True)
     
+    __table_args__ = (
+        Index('idx_gpus_provider_name', 'provider', 'provider_name'),
+        Index('idx_gpus_provider_status', 'provider', 'status'),
+    )
+    
     def __repr__(self):
         return f"<GPU {self.name}: {self.status}>"
 
@@ -0,0 +1,55 @@
+"""
+CPU Utilization Sampler
+
+psutil.cpu_percent(interval=None) measures against the previous call, and that
+baseline is shared by every caller in the process, so two readers would each
+only see the slice since the other's last read. This module runs one
+background thread that owns the measurement and publishes the latest reading.
+"""
+
+import logging
+from typing import Optional
+import threading
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Seconds per sample; readers see utilization at most this stale
+CPU_SAMPLE_INTERVAL = 0.25
+
+_cpu_percent = 0.0
+_sampler_thread: Optional[threading.Thread] = None
+_sampler_lock = threading.Lock()
+
+def start_cpu_sampler(interval_seconds: float = CPU_SAMPLE_INTERVAL) -> None:
+    """
+    Start the background CPU sampler if it is not already running.
+
+    Args:
+        interval_seconds (float): Length of each sample window in seconds.
+    """
+    global _sampler_thread
+
+    def sample_task():
+        global _cpu_percent
+        while True:
+            # Sleeps for the sample window on this thread only
+            _cpu_percent = psutil.cpu_percent(interval=interval_seconds)
+
+    with _sampler_lock:
+        if _sampler_thread is not None:
+            return
+        _sampler_thread = threading.Thread(target=sample_task, name="cpu-sampler", daemon=True)
+        _sampler_thread.start()
+    logger.info(f"Started background CPU sampling with interval of {interval_seconds} seconds")
+
+def get_cpu_percent() -> float:
+    """
+    Get the most recent system-wide CPU utilization.
+
+    Returns:
+        float: CPU utilization percentage from the last completed sample.
+    """
+    start_cpu_sampler()
+    return _cpu_percent
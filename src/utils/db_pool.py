@@ -0,0 +1,41 @@
+from typing import Optional
+import asyncio
+import logging
+import os
+
+import asyncpg
+
+from ..config.utils import get_database_url
+
+logger = logging.getLogger(__name__)
+
+# One pool per process, opened on first use and closed by the app lifespan,
+# so connection setup (TCP, TLS, auth) is paid once instead of per query
+_pg_pool: Optional[asyncpg.Pool] = None
+_pg_pool_lock = asyncio.Lock()
+
+async def get_pg_pool() -> asyncpg.Pool:
+    """Return the shared asyncpg pool, creating it on first use"""
+    global _pg_pool
+    if _pg_pool is not None:
+        return _pg_pool
+
+    async with _pg_pool_lock:
+        if _pg_pool is None:
+            dsn = os.getenv("DATABASE_URL") or get_database_url()
+            _pg_pool = await asyncpg.create_pool(
+                dsn=dsn,
+                min_size=2,
+                max_size=10,
+                max_inactive_connection_lifetime=300
+            )
+            logger.info("PostgreSQL connection pool created")
+    return _pg_pool
+
+async def close_pg_pool() -> None:
+    """Close the shared asyncpg pool"""
+    global _pg_pool
+    if _pg_pool is not None:
+        await _pg_pool.close()
+        logger.info("PostgreSQL connection pool closed")
+    _pg_pool = None
@@ -10,7 +10,8 @@ import logging
 from typing import Dict, List, Any, Optional
 import threading
 import time
-from datetime import datetime
+
+from src.utils.timestamps import utc_isoformat
 
 # Import NVML with error handling
 try:
@@ -24,6 +25,12 @@ except ImportError:
 _nvml_lock = threading.Lock()
 _nvml_initialized = False
 
+# Handles and identity fields never change for a device while NVML is
+# initialized, so they are looked up once and reused by every poll
+_gpu_handles: Dict[int, Any] = {}
+_gpu_names: Dict[Any, str] = {}
+_gpu_uuids: Dict[Any, str] = {}
+
 logger = logging.getLogger(__name__)
 
 def initialize_nvml() -> bool:
@@ -39,6 +46,10 @@ def initialize_nvml() -> bool:
         logger.warning("NVML not available. Cannot initialize.")
         return False
     
+    # Every metrics call comes through here; once initialized, skip the lock
+    if _nvml_initialized:
+        return True
+    
     with _nvml_lock:
         if not _nvml_initialized:
             try:
@@ -64,11 +75,15 @@ def shutdown_nvml() -> bool:
         logger.warning("NVML not available. Nothing to shut down.")
         return False
     
+    if not _nvml_initialized:
+        return True
+    
     with _nvml_lock:
         if _nvml_initialized:
             try:
                 pynvml.nvmlShutdown()
                 _nvml_initialized = False
+                reset_gpu_cache()
                 logger.info("NVML shut down successfully")
                 return True
             except Exception as e:
@@ -76,6 +91,17 @@ def shutdown_nvml() -> bool:
                 return False
         return True
 
+def reset_gpu_cache() -> None:
+    """
+    Forget cached GPU handles, names and UUIDs.
+    
+    Called on NVML shutdown, since handles are invalid afterwards, and by
+    tests that patch NVML functions.
+    """
+    _gpu_handles.clear()
+    _gpu_names.clear()
+    _gpu_uuids.clear()
+
 def get_gpu_count() -> int:
     """
     Get the number of NVIDIA GPUs in the system.
@@ -102,11 +128,16 @@ def get_gpu_handle(index: int) -> Optional[Any]:
     Returns:
         Optional[Any]: GPU handle or None if the GPU is not available.
     """
+    handle = _gpu_handles.get(index)
+    if handle is not None:
+        return handle
+    
     if not NVML_AVAILABLE or not initialize_nvml():
         return None
     
     try:
-        return pynvml.nvmlDeviceGetHandleByIndex(index)
+        handle = _gpu_handles[index] = pynvml.nvmlDeviceGetHandleByIndex(index)
+        return handle
     except Exception as e:
         logger.error(f"Failed to get handle for GPU {index}: {str(e)}")
         return None
@@ -124,8 +155,13 @@ def get_gpu_name(handle: Any) -> str:
     if not NVML_AVAILABLE or handle is None:
         return "Unknown"
     
+    name = _gpu_names.get(handle)
+    if name is not None:
+        return name
+    
     try:
-        return pynvml.nvmlDeviceGetName(handle).decode('utf-8')
+        name = _gpu_names[handle] = pynvml.nvmlDeviceGetName(handle).decode('ascii')
+        return name
     except Exception as e:
         logger.error(f"Failed to get GPU name: {str(e)}")
         return "Unknown"
@@ -143,8 +179,13 @@ def get_gpu_uuid(handle: Any) -> str:
     if not NVML_AVAILABLE or handle is None:
         return "Unknown"
     
+    uuid = _gpu_uuids.get(handle)
+    if uuid is not None:
+        return uuid
+    
     try:
-        return pynvml.nvmlDeviceGetUUID(handle).decode('utf-8')
+        uuid = _gpu_uuids[handle] = pynvml.nvmlDeviceGetUUID(handle).decode('ascii')
+        return uuid
     except Exception as e:
         logger.error(f"Failed to get GPU UUID: {str(e)}")
         return "Unknown"
@@ -187,10 +228,10 @@ def get_gpu_memory(handle: Any) -> Dict[str, int]:
     
     try:
         memory = pynvml.nvmlDeviceGetMemoryInfo(handle)
-        # Convert bytes to MB
-        total = memory.total // (1024 * 1024)
-        used = memory.used // (1024 * 1024)
-        free = memory.free // (1024 * 1024)
+        # Convert bytes to MB (floor, same as // 2**20)
+        total = memory.total >> 20
+        used = memory.used >> 20
+        free = memory.free >> 20
         
         return {
             "total": total,
@@ -265,6 +306,60 @@ def get_gpu_clock_speeds(handle: Any) -> Dict[str, int]:
         logger.error(f"Failed to get GPU clock speeds: {str(e)}")
         return {"graphics": 0, "memory": 0}
 
+def _collect(index: int, handle: Any) -> Dict[str, Any]:
+    """
+    Collect all metrics for one GPU in a single pass.
+    
+    NVML functions are bound to locals and read without per-field error
+    handling. If any call fails, the per-field helpers are used instead so
+    a single unsupported query only zeroes its own field.
+    
+    Args:
+        index (int): The index of the GPU.
+        handle (Any): GPU handle obtained from get_gpu_handle.
+        
+    Returns:
+        Dict[str, Any]: Metrics for the GPU.
+    """
+    nvml = pynvml
+    try:
+        name = _gpu_names.get(handle)
+        if name is None:
+            name = _gpu_names[handle] = nvml.nvmlDeviceGetName(handle).decode('ascii')
+        uuid = _gpu_uuids.get(handle)
+        if uuid is None:
+            uuid = _gpu_uuids[handle] = nvml.nvmlDeviceGetUUID(handle).decode('ascii')
+        memory = nvml.nvmlDeviceGetMemoryInfo(handle)
+        clock_info = nvml.nvmlDeviceGetClockInfo
+        return {
+            "id": f"gpu-{index}",
+            "name": name,
+            "uuid": uuid,
+            "utilization": nvml.nvmlDeviceGetUtilizationRates(handle).gpu,
+            "memory": {
+                "total": memory.total >> 20,
+                "used": memory.used >> 20,
+                "free": memory.free >> 20
+            },
+            "temperature": nvml.nvmlDeviceGetTemperature(handle, nvml.NVML_TEMPERATURE_GPU),
+            "power_usage": nvml.nvmlDeviceGetPowerUsage(handle) / 1000.0,
+            "clock_speeds": {
+                "graphics": clock_info(handle, nvml.NVML_CLOCK_GRAPHICS),
+                "memory": clock_info(handle, nvml.NVML_CLOCK_MEM)
+            }
+        }
+    except Exception:
+        return {
+            "id": f"gpu-{index}",
+            "name": get_gpu_name(handle),
+            "uuid": get_gpu_uuid(handle),
+            "utilization": get_gpu_utilization(handle)["gpu"],
+            "memory": get_gpu_memory(handle),
+            "temperature": get_gpu_temperature(handle),
+            "power_usage": get_gpu_power_usage(handle),
+            "clock_speeds": get_gpu_clock_speeds(handle)
+        }
+
 def get_all_gpu_metrics() -> List[Dict[str, Any]]:
     """
     Get metrics from all available GPUs in the system.
@@ -278,17 +373,7 @@ def get_all_gpu_metrics() -> List[Dict[str, Any]]:
     for i in range(gpu_count):
         handle = get_gpu_handle(i)
         if handle:
-            gpu_info = {
-                "id": f"gpu-{i}",
-                "name": get_gpu_name(handle),
-                "uuid": get_gpu_uuid(handle),
-                "utilization": get_gpu_utilization(handle)["gpu"],
-                "memory": get_gpu_memory(handle),
-                "temperature": get_gpu_temperature(handle),
-                "power_usage": get_gpu_power_usage(handle),
-                "clock_speeds": get_gpu_clock_speeds(handle)
-            }
-            gpu_metrics.append(gpu_info)
+            gpu_metrics.append(_collect(i, handle))
     
     # If no GPUs are available or metrics couldn't be collected, return a placeholder
     if not gpu_metrics and not NVML_AVAILABLE:
@@ -314,7 +399,7 @@ def get_formatted_gpu_metrics() -> Dict[str, Any]:
         Dict[str, Any]: Dictionary with timestamp and GPU metrics.
     """
     return {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": utc_isoformat(),
         "gpus": get_all_gpu_metrics()
     }
 
@@ -1,28 +1,110 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import logging
-import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from diffusers import StableDiffusionXLPipeline
+import asyncio
+import io
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import partial
+import importlib.util
 import gc
 
 logger = logging.getLogger(__name__)
 
+# Output formats _convert_image_to_bytes can encode
+SUPPORTED_IMAGE_FORMATS = frozenset({"webp", "jpeg", "jpg", "png"})
+
+# Resolved once per process; find_spec walks sys.path and may touch the filesystem
+_HAS_ML = all(
+    importlib.util.find_spec(module) is not None
+    for module in ("torch", "transformers", "diffusers")
+)
+
+if _HAS_ML:
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    from diffusers import StableDiffusionXLPipeline
+    from diffusers.models.attention_processor import AttnProcessor2_0
+    
+    # This process only runs inference; skip autograd bookkeeping by default
+    torch.set_grad_enabled(False)
+
+# Weight-only quantization is optional; fall back to full-precision weights without it
+try:
+    from torchao.quantization import quantize_, Int8WeightOnlyConfig, Int4WeightOnlyConfig
+    TORCHAO_AVAILABLE = True
+except ImportError:
+    TORCHAO_AVAILABLE = False
+
+# torchvision is optional and lets JPEG encoding run on the GPU via nvJPEG;
+# encode_jpeg only accepts CUDA tensors from 0.19 on, so older builds use PIL
+try:
+    import torchvision
+    from torchvision.io import encode_jpeg
+    from torchvision.transforms.functional import pil_to_tensor
+    _TORCHVISION_VERSION = tuple(int(part) for part in torchvision.__version__.split(".")[:2])
+    GPU_JPEG_AVAILABLE = _TORCHVISION_VERSION >= (0, 19)
+except (ImportError, ValueError):
+    GPU_JPEG_AVAILABLE = False
+
+@dataclass
+class LoadedTextModel:
+    """Text model plus the per-request values resolved once at load time"""
+    model: Any
+    tokenizer: Any
+    pad_token_id: Optional[int]
+    max_length: int
+    temperature: float
+    top_p: float
+
 class ModelRunner:
     """Efficient model runner with resource management"""
     
     def __init__(self):
+        if not _HAS_ML:
+            raise RuntimeError("ModelRunner requires torch, transformers and diffusers")
+        
+        # Resolved once; torch.cuda.is_available() re-queries the driver on every call
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        # Cleared after the first GPU JPEG failure so later images go straight to PIL
+        self._gpu_jpeg = GPU_JPEG_AVAILABLE and self.device == "cuda"
         self.loaded_models: Dict[str, Any] = {}
+        # One lock per model type so concurrent jobs wait for a single load
+        # instead of each loading their own copy into VRAM
+        self._model_locks: Dict[str, asyncio.Lock] = {}
+        # All model loading and generation runs on one dedicated thread: CUDA
+        # graphs are thread-affine and GPU jobs must not queue behind the
+        # default executor's unrelated blocking work
+        self._gpu_executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="gpu",
+            initializer=torch.set_grad_enabled,
+            initargs=(False,)
+        )
+        # Image encoding is CPU-bound; keep it off the event loop and the GPU path
+        self._encode_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="encode")
         self.model_configs = {
             "text-generation": {
                 "model_id": "mistralai/Mistral-7B-v0.1",
                 "type": "text",
-                "max_length": 2048
+                "max_length": 2048,
+                "attn_implementation": "sdpa",
+                # Opt-in weight-only quantization ("int8" or "int4_gs<group size>").
+                # Needs torchao, which the pinned torch 2.1 can't run; without it
+                # the setting is ignored with a warning
+                "quantization": None,
+                "temperature": 0.7,
+                "top_p": 0.9
             },
             "image-generation": {
                 "model_id": "stabilityai/stable-diffusion-xl-base-1.0",
                 "type": "image",
-                "max_batch_size": 4
+                "max_batch_size": 4,
+                # Offload idle submodules to CPU; for models that share a GPU and run infrequently
+                "cpu_offload": False,
+                # (height, width) shapes that get a captured CUDA graph at load time
+                "resolution_buckets": [(1024, 1024), (768, 1344), (1344, 768)]
             }
         }
     
@@ -35,6 +117,10 @@ class ModelRunner:
             if not model_config:
                 raise ValueError(f"Unsupported model type: {model_type}")
             
+            # Reject bad requests before any model load or GPU work
+            if model_config["type"] == "image":
+                self._image_format(job_config)
+            
             # Load or get cached model
             model = await self._get_model(model_type, model_config)
             
@@ -52,78 +138,182 @@ class ModelRunner:
         if model_type in self.loaded_models:
             return self.loaded_models[model_type]
         
-        try:
-            # Clear GPU memory if needed
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-                gc.collect()
-            
-            if config["type"] == "text":
-                model = await self._load_text_model(config["model_id"])
-            else:
-                model = await self._load_image_model(config["model_id"])
-            
-            self.loaded_models[model_type] = model
-            return model
+        lock = self._model_locks.setdefault(model_type, asyncio.Lock())
+        async with lock:
+            # Another job may have finished loading while we waited
+            if model_type in self.loaded_models:
+                return self.loaded_models[model_type]
             
-        except Exception as e:
-            logger.error(f"Error loading model {model_type}: {str(e)}")
-            raise
+            try:
+                # Clear GPU memory if needed
+                if self.device == "cuda":
+                    torch.cuda.empty_cache()
+                    gc.collect()
+                
+                loader = self._load_text_model if config["type"] == "text" else self._load_image_model
+                loop = asyncio.get_running_loop()
+                model = await loop.run_in_executor(self._gpu_executor, loader, config)
+                
+                self.loaded_models[model_type] = model
+                return model
+                
+            except Exception as e:
+                logger.error(f"Error loading model {model_type}: {str(e)}")
+                raise
     
-    async def _load_text_model(self, model_id: str) -> Any:
+    def _load_text_model(self, config: Dict[str, Any]) -> LoadedTextModel:
         """Load a text generation model"""
         try:
+            model_id = config["model_id"]
+            quantization = config.get("quantization")
+            if self.device != "cuda":
+                dtype = torch.float32
+            elif quantization and TORCHAO_AVAILABLE:
+                # torchao's packed int4 kernels expect bfloat16 activations
+                dtype = torch.bfloat16
+            else:
+                dtype = torch.float16
+            
             tokenizer = AutoTokenizer.from_pretrained(model_id)
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
             model = AutoModelForCausalLM.from_pretrained(
                 model_id,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
+                torch_dtype=dtype,
                 low_cpu_mem_usage=True,
-                device_map="auto"
+                device_map="auto",
+                attn_implementation=config.get("attn_implementation", "sdpa")
+            )
+            model = self._quantize_text_model(model, quantization)
+            return LoadedTextModel(
+                model=model,
+                tokenizer=tokenizer,
+                pad_token_id=tokenizer.pad_token_id,
+                max_length=config["max_length"],
+                temperature=config.get("temperature", 0.7),
+                top_p=config.get("top_p", 0.9)
             )
-            return {"model": model, "tokenizer": tokenizer}
         except Exception as e:
             logger.error(f"Error loading text model: {str(e)}")
             raise
     
-    async def _load_image_model(self, model_id: str) -> Any:
+    def _quantize_text_model(self, model: Any, quantization: Optional[str]) -> Any:
+        """Pack linear weights to INT8/INT4 so bandwidth-bound decode reads fewer bytes per token"""
+        if not quantization or self.device != "cuda":
+            return model
+        if not TORCHAO_AVAILABLE:
+            logger.warning(f"torchao not installed, skipping {quantization} quantization")
+            return model
+        
+        if quantization == "int8":
+            quantize_(model, Int8WeightOnlyConfig())
+        elif quantization.startswith("int4"):
+            # e.g. "int4_gs256" -> group size 256
+            _, _, group_size = quantization.partition("_gs")
+            quantize_(model, Int4WeightOnlyConfig(group_size=int(group_size or 128)))
+        else:
+            raise ValueError(f"Unsupported quantization scheme: {quantization}")
+        
+        return model
+    
+    def _load_image_model(self, config: Dict[str, Any]) -> Any:
         """Load an image generation model"""
         try:
             pipe = StableDiffusionXLPipeline.from_pretrained(
-                model_id,
+                config["model_id"],
                 torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
                 use_safetensors=True,
                 variant="fp16" if self.device == "cuda" else None
             )
+            # Fused scaled-dot-product attention instead of the naive math kernel
+            pipe.unet.set_attn_processor(AttnProcessor2_0())
+            # Per-step progress bar output is pure overhead for a server
+            pipe.set_progress_bar_config(disable=True)
             if self.device == "cuda":
-                pipe = pipe.to(self.device)
+                # cuDNN picks faster convolution kernels for NHWC tensors
+                pipe.unet.to(memory_format=torch.channels_last)
+                pipe.vae.to(memory_format=torch.channels_last)
+                if config.get("cpu_offload"):
+                    # Submodules move to the GPU only while they run, which
+                    # rules out static CUDA graphs
+                    pipe.enable_model_cpu_offload()
+                else:
+                    pipe = pipe.to(self.device)
+                    self._capture_unet_graphs(pipe, config.get("resolution_buckets", []))
             return pipe
         except Exception as e:
             logger.error(f"Error loading image model: {str(e)}")
             raise
     
-    async def _run_text_generation(self, model: Dict[str, Any], job_config: Dict[str, Any]) -> Dict[str, Any]:
+    def _capture_unet_graphs(self, pipe: Any, buckets: List[Tuple[int, int]]) -> None:
+        """Compile the UNet with CUDA graphs and warm one graph per resolution bucket"""
+        # reduce-overhead records a CUDA graph per static input shape, so each
+        # denoising step replays a single graph instead of its whole launch chain
+        pipe.unet = torch.compile(pipe.unet, mode="reduce-overhead", fullgraph=True)
+        
+        with torch.inference_mode(), self._attention_context():
+            for height, width in buckets:
+                # Enough steps for the graph to be recorded; skip the VAE decode
+                pipe(
+                    prompt="",
+                    num_inference_steps=3,
+                    height=height,
+                    width=width,
+                    output_type="latent"
+                )
+                logger.info(f"Captured UNet CUDA graph for {height}x{width}")
+    
+    def _resolve_resolution(self, job_config: Dict[str, Any]) -> Tuple[int, int]:
+        """Snap the requested resolution to the closest pre-captured bucket"""
+        buckets = self.model_configs["image-generation"].get("resolution_buckets") or [(1024, 1024)]
+        height = job_config.get("height", buckets[0][0])
+        width = job_config.get("width", buckets[0][1])
+        return min(buckets, key=lambda b: abs(b[0] - height) + abs(b[1] - width))
+    
+    def _attention_context(self):
+        """Restrict SDPA to the fused flash / memory-efficient kernels on CUDA"""
+        if self.device != "cuda":
+            return nullcontext()
+        return torch.backends.cuda.sdp_kernel(
+            enable_flash=True,
+            enable_mem_efficient=True,
+            enable_math=False
+        )
+    
+    def _generate(self, fn: Any, *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking model call; executes on the GPU executor thread"""
+        with torch.inference_mode(), self._attention_context():
+            return fn(*args, **kwargs)
+    
+    async def _run_text_generation(self, model: LoadedTextModel, job_config: Dict[str, Any]) -> Dict[str, Any]:
         """Run text generation"""
         try:
             prompt = job_config.get("prompt", "")
-            max_length = min(
-                job_config.get("max_length", 1024),
-                self.model_configs["text-generation"]["max_length"]
-            )
+            max_length = min(job_config.get("max_length", 1024), model.max_length)
             
-            inputs = model["tokenizer"](prompt, return_tensors="pt")
+            # Tokenize on the event loop so the GPU thread only runs generate()
+            tokenizer = model.tokenizer
+            inputs = tokenizer(prompt, return_tensors="pt")
+            prompt_length = inputs["input_ids"].shape[1]
             if self.device == "cuda":
-                inputs = inputs.to(self.device)
+                inputs = {k: v.to(self.device, non_blocking=True) for k, v in inputs.items()}
             
-            with torch.no_grad():
-                outputs = model["model"].generate(
+            loop = asyncio.get_running_loop()
+            outputs = await loop.run_in_executor(
+                self._gpu_executor,
+                partial(
+                    self._generate,
+                    model.model.generate,
                     **inputs,
-                    max_length=max_length,
+                    max_new_tokens=max(max_length - prompt_length, 1),
                     num_return_sequences=1,
-                    temperature=job_config.get("temperature", 0.7),
-                    top_p=job_config.get("top_p", 0.9)
+                    temperature=job_config.get("temperature", model.temperature),
+                    top_p=job_config.get("top_p", model.top_p),
+                    pad_token_id=model.pad_token_id
                 )
+            )
             
-            response = model["tokenizer"].decode(outputs[0], skip_special_tokens=True)
+            response = tokenizer.decode(outputs[0], skip_special_tokens=True)
             return {"text": response}
             
         except Exception as e:
@@ -135,36 +325,77 @@ class ModelRunner:
         try:
             prompt = job_config.get("prompt", "")
             negative_prompt = job_config.get("negative_prompt", "")
+            height, width = self._resolve_resolution(job_config)
             
-            image = model(
-                prompt=prompt,
-                negative_prompt=negative_prompt,
-                num_inference_steps=job_config.get("steps", 30),
-                guidance_scale=job_config.get("guidance_scale", 7.5)
-            ).images[0]
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._gpu_executor,
+                partial(
+                    self._generate,
+                    model,
+                    prompt=prompt,
+                    negative_prompt=negative_prompt,
+                    height=height,
+                    width=width,
+                    num_inference_steps=job_config.get("steps", 30),
+                    guidance_scale=job_config.get("guidance_scale", 7.5)
+                )
+            )
+            image = result.images[0]
             
             # Convert to base64 for API response
-            import io
-            import base64
-            buffered = io.BytesIO()
-            image.save(buffered, format="PNG")
-            image_base64 = base64.b64encode(buffered.getvalue()).decode()
+            image_format = self._image_format(job_config)
+            image_bytes = await loop.run_in_executor(
+                self._encode_pool, self._convert_image_to_bytes, image, image_format
+            )
+            image_base64 = base64.b64encode(image_bytes).decode()
             
-            return {"image": image_base64}
+            return {"image": image_base64, "format": image_format}
             
         except Exception as e:
             logger.error(f"Error in image generation: {str(e)}")
             raise
     
+    @staticmethod
+    def _image_format(job_config: Dict[str, Any]) -> str:
+        """Get the requested output format, raising if it can't be encoded"""
+        image_format = job_config.get("format", "webp")
+        if not isinstance(image_format, str) or image_format.lower() not in SUPPORTED_IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format!r}")
+        return image_format.lower()
+    
+    def _convert_image_to_bytes(self, image: Any, image_format: str = "webp") -> bytes:
+        """Encode a generated image; WebP/JPEG are far cheaper to encode than PNG"""
+        if image_format in ("jpeg", "jpg") and self._gpu_jpeg:
+            try:
+                tensor = pil_to_tensor(image).to(self.device)
+                return encode_jpeg(tensor, quality=90).cpu().numpy().tobytes()
+            except Exception as e:
+                self._gpu_jpeg = False
+                logger.warning(f"GPU JPEG encode failed, using PIL from now on: {str(e)}")
+        
+        buffered = io.BytesIO()
+        if image_format == "webp":
+            image.save(buffered, format="WEBP", quality=90, method=4)
+        elif image_format in ("jpeg", "jpg"):
+            image.save(buffered, format="JPEG", quality=90)
+        elif image_format == "png":
+            image.save(buffered, format="PNG")
+        else:
+            raise ValueError(f"Unsupported image format: {image_format}")
+        return buffered.getvalue()
+    
     def cleanup(self):
         """Clean up resources"""
         try:
             self.loaded_models.clear()
-            if torch.cuda.is_available():
+            if self.device == "cuda":
                 torch.cuda.empty_cache()
             gc.collect()
         except Exception as e:
             logger.error(f"Error in cleanup: {str(e)}")
 
-# Global model runner instance
-model_runner = ModelRunner()
+# Global model runner instance (None when the ML stack is not installed)
+model_runner = ModelRunner() if _HAS_ML else None
+if model_runner is None:
+    logger.warning("ML dependencies not available. Model runner disabled.")
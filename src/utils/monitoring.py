@@ -1,12 +1,17 @@
 import time
-from typing import Dict, List, Any, Callable, TypeVar, ParamSpec
+from typing import Dict, List, Any, Callable, Optional, TypeVar, ParamSpec
 import logging
 from prometheus_client import start_http_server, Gauge, Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector, REGISTRY
 import psutil
-from functools import wraps
+from functools import lru_cache, wraps
 from datetime import datetime, timedelta
 import httpx
 from ..core.rune_config import RuneSettings
+from ..models.domain import JobStatus
+from .db_pool import get_pg_pool
+from .cpu_sampler import get_cpu_percent, start_cpu_sampler
 import asyncio
 
 logger = logging.getLogger(__name__)
@@ -16,10 +21,67 @@ cpu_utilization = Gauge('cpu_utilization_percent', 'CPU utilization percentage')
 ram_utilization = Gauge('ram_utilization_percent', 'RAM utilization percentage')
 
 # GPU Metrics from RUNE
-gpu_online_status = Gauge('gpu_online_status', 'GPU online status (1=online, 0=offline)', ['hostname'])
-gpu_last_heartbeat = Gauge('gpu_last_heartbeat', 'Last GPU heartbeat timestamp', ['hostname'])
-rune_api_status = Gauge('rune_api_status', 'RUNE API status (1=up, 0=down)', ['error_type'])
-rune_api_last_check = Gauge('rune_api_last_check', 'Last time the RUNE API was checked')
+RUNE_ERROR_TYPES = ('maintenance', 'auth', 'connection', 'unknown')
+
+class RuneCollector(Collector):
+    """Serves the latest RUNE API snapshot as metric families at scrape time"""
+    
+    def __init__(self):
+        # Replaced wholesale on every update so the scrape thread always
+        # reads a consistent snapshot without locking
+        self.snapshot: Dict[str, Any] = {
+            "last_check": 0.0,
+            "error_type": None,
+            "online": {},
+            "heartbeat": {}
+        }
+    
+    def record_check(self) -> None:
+        """Mark the start of a RUNE API check and clear the previous error"""
+        self.snapshot = {**self.snapshot, "last_check": time.time(), "error_type": None}
+    
+    def record_error(self, error_type: str) -> None:
+        """Record the error type of the current check"""
+        self.snapshot = {**self.snapshot, "error_type": error_type}
+    
+    def record_gpu(self, hostname: str, online: bool, last_heartbeat: float) -> None:
+        """Record the online status and last heartbeat of a GPU host"""
+        snapshot = self.snapshot
+        self.snapshot = {
+            **snapshot,
+            "online": {**snapshot["online"], hostname: 1 if online else 0},
+            "heartbeat": {**snapshot["heartbeat"], hostname: last_heartbeat}
+        }
+    
+    def collect(self):
+        snapshot = self.snapshot
+        
+        online = GaugeMetricFamily('gpu_online_status', 'GPU online status (1=online, 0=offline)', labels=['hostname'])
+        for hostname, value in snapshot["online"].items():
+            online.add_metric([hostname], value)
+        yield online
+        
+        heartbeat = GaugeMetricFamily('gpu_last_heartbeat', 'Last GPU heartbeat timestamp', labels=['hostname'])
+        for hostname, value in snapshot["heartbeat"].items():
+            heartbeat.add_metric([hostname], value)
+        yield heartbeat
+        
+        status = GaugeMetricFamily('rune_api_status', 'RUNE API status (1=up, 0=down)', labels=['error_type'])
+        for error_type in RUNE_ERROR_TYPES:
+            status.add_metric([error_type], 1 if snapshot["error_type"] == error_type else 0)
+        yield status
+        
+        yield GaugeMetricFamily('rune_api_last_check', 'Last time the RUNE API was checked', value=snapshot["last_check"])
+
+rune_collector = RuneCollector()
+REGISTRY.register(rune_collector)
+
+# Buckets sized for an external API rather than the in-process defaults
+rune_api_duration = Histogram(
+    'rune_api_duration_seconds',
+    'RUNE API request latency',
+    buckets=(.05, .1, .25, .5, 1, 2, 5, 10, 30)
+)
 
 # Job Metrics
 gpu_jobs_queued = Gauge('gpu_jobs_queued_total', 'Total number of jobs in queued state')
@@ -27,71 +89,166 @@ gpu_jobs_running = Gauge('gpu_jobs_running_total', 'Total number of jobs in runn
 gpu_jobs_completed = Counter('gpu_jobs_completed_total', 'Total number of completed jobs', ['model_name'])
 gpu_jobs_failed = Counter('gpu_jobs_failed_total', 'Total number of failed jobs', ['model_name'])
 
+# model_name label values; anything else is reported as "other" so
+# arbitrary caller-supplied names can't create unbounded time series
+ALLOWED_MODELS = frozenset({
+    'phi-2',
+    'deepseek-coder',
+    'stable-diffusion-xl',
+    'text-generation',
+    'image-generation',
+    'unknown',
+})
+OTHER_MODEL_LABEL = 'other'
+
+# Label children bound once per model name; .labels() takes the metric lock
+# and does a dict lookup on every call
+_jobs_completed_children: Dict[str, Any] = {
+    label: gpu_jobs_completed.labels(model_name=label)
+    for label in ALLOWED_MODELS | {OTHER_MODEL_LABEL}
+}
+_jobs_failed_children: Dict[str, Any] = {
+    label: gpu_jobs_failed.labels(model_name=label)
+    for label in ALLOWED_MODELS | {OTHER_MODEL_LABEL}
+}
+
+def _bound_child(children: Dict[str, Any], model_name: str) -> Any:
+    """Get the pre-bound child for a model name, or the "other" child"""
+    return children.get(model_name, children[OTHER_MODEL_LABEL])
+
+# Job lifecycle hooks: gauges are updated on state transitions so scrapes
+# only read current values and never have to query the database
+def on_job_queued() -> None:
+    """Record a job entering the queue"""
+    gpu_jobs_queued.inc()
+
+def on_job_started() -> None:
+    """Record a queued job starting on a GPU"""
+    gpu_jobs_queued.dec()
+    gpu_jobs_running.inc()
+
+def on_job_completed(previous_status: str) -> None:
+    """Record a job leaving the queue or a GPU (completed, failed or cancelled)
+    
+    Args:
+        previous_status: Job status before this transition. Jobs that were
+            already in a terminal state (e.g. cancelled while running) were
+            counted out when they got there.
+    """
+    if previous_status == JobStatus.RUNNING:
+        gpu_jobs_running.dec()
+    elif previous_status == JobStatus.QUEUED:
+        gpu_jobs_queued.dec()
+
+async def sync_job_gauges() -> None:
+    """Set the job gauges from the database, correcting any drift"""
+    pool = await get_pg_pool()
+    rows = await pool.fetch("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")
+    counts = {row["status"]: row["count"] for row in rows}
+    gpu_jobs_queued.set(counts.get(JobStatus.QUEUED.value, 0))
+    gpu_jobs_running.set(counts.get(JobStatus.RUNNING.value, 0))
+
+async def _job_gauge_housekeeping(interval: float = 60.0):
+    """Seed the job gauges at startup, then resync them once per interval"""
+    while True:
+        try:
+            await sync_job_gauges()
+        except Exception as e:
+            logger.error(f"Error syncing job gauges: {str(e)}")
+        await asyncio.sleep(interval)
+
+@lru_cache(maxsize=128)
+def _parse_heartbeat(raw: str) -> float:
+    """Convert a RUNE ISO 8601 UTC heartbeat to seconds since epoch"""
+    # Heartbeats repeat across cycles while a host is idle, so the cache
+    # usually skips parsing entirely
+    return datetime.fromisoformat(raw.replace('Z', '+00:00')).timestamp()
+
 class GPUMetricsCollector:
     """Collects system and GPU metrics from RUNE API"""
     
     def __init__(self, rune_settings: RuneSettings):
         """Initialize the metrics collector"""
         self.rune_settings = rune_settings
-        self.http_client = httpx.AsyncClient(
-            base_url=rune_settings.RUNE_API_BASE_URL,
-            headers={"x-api-key": rune_settings.RUNE_API_KEY}
-        )
-        self.last_collection_time = time.time()
+        self._http_client: Optional[httpx.AsyncClient] = None
+        
+        start_cpu_sampler()
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """RUNE API client, created on first use inside the running event loop"""
+        if self._http_client is None:
+            # Keep one HTTP/2 connection alive across the 15s collection cycle
+            # (75s matches nginx's keepalive default) instead of a new TLS
+            # handshake per scrape
+            self._http_client = httpx.AsyncClient(
+                base_url=self.rune_settings.RUNE_API_BASE_URL,
+                headers={"x-api-key": self.rune_settings.RUNE_API_KEY},
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=20,
+                    keepalive_expiry=75.0
+                ),
+                timeout=httpx.Timeout(10.0, connect=5.0)
+            )
+        return self._http_client
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP connection pool"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
 
     async def collect_rune_metrics(self) -> Dict[str, Any]:
         """Collect metrics from RUNE API"""
         try:
-            # Update last check timestamp
-            rune_api_last_check.set(time.time())
-            
-            # Reset error status
-            rune_api_status.labels(error_type='maintenance').set(0)
-            rune_api_status.labels(error_type='auth').set(0)
-            rune_api_status.labels(error_type='connection').set(0)
-            rune_api_status.labels(error_type='unknown').set(0)
+            # Update last check timestamp and reset error status
+            rune_collector.record_check()
             
             # Get GPU status from RUNE API
             endpoint = f"/customer-status/{self.rune_settings.RUNE_CLUSTER_ID}"
-            response = await self.http_client.get(endpoint)
+            with rune_api_duration.time():
+                response = await self.http_client.get(endpoint)
             
             if response.status_code == 200:
                 data = response.json()
                 # Update Prometheus metrics
-                gpu_online_status.labels(hostname=data["hostname"]).set(1 if data["status_online"] else 0)
-                
-                # Convert UTC timestamp to seconds since epoch
-                last_heartbeat = datetime.fromisoformat(data["last_heartbeat"].replace('Z', '+00:00'))
-                gpu_last_heartbeat.labels(hostname=data["hostname"]).set(last_heartbeat.timestamp())
+                rune_collector.record_gpu(
+                    data["hostname"],
+                    data["status_online"],
+                    _parse_heartbeat(data["last_heartbeat"])
+                )
                 
                 logger.info(f"Successfully collected metrics from RUNE API for GPU {data['hostname']}")
                 return data
             elif response.status_code == 401:
                 logger.error("Unauthorized access to RUNE API. Please check your API key.")
-                rune_api_status.labels(error_type='auth').set(1)
+                rune_collector.record_error('auth')
                 return {}
             elif response.status_code == 404:
                 logger.error(f"GPU cluster {self.rune_settings.RUNE_CLUSTER_ID} not found.")
-                rune_api_status.labels(error_type='maintenance').set(1)
+                rune_collector.record_error('maintenance')
                 return {}
             else:
                 logger.error(f"Failed to collect RUNE metrics: {response.status_code} - {response.text}")
-                rune_api_status.labels(error_type='unknown').set(1)
+                rune_collector.record_error('unknown')
                 return {}
         except httpx.ConnectError:
             logger.error("Failed to connect to RUNE API. Service might be down.")
-            rune_api_status.labels(error_type='connection').set(1)
+            rune_collector.record_error('connection')
             return {}
         except Exception as e:
             logger.error(f"Error collecting RUNE metrics: {str(e)}")
-            rune_api_status.labels(error_type='unknown').set(1)
+            rune_collector.record_error('unknown')
             return {}
     
     async def collect_metrics(self) -> Dict[str, Any]:
         """Collect all metrics"""
         try:
             # Collect system metrics
-            cpu_percent = psutil.cpu_percent(interval=1)
+            cpu_percent = get_cpu_percent()
+            # One /proc/meminfo read; every memory field comes from this tuple
             memory = psutil.virtual_memory()
             
             # Update Prometheus metrics
@@ -121,21 +278,21 @@ def monitor(func: Callable[P, T]) -> Callable[P, T]:
     @wraps(func)
     async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
         try:
-            start_time = time.time()
+            start_ns = time.perf_counter_ns()
             result = await func(*args, **kwargs)
-            duration = time.time() - start_time
+            duration = (time.perf_counter_ns() - start_ns) / 1e9
             
             # Update success metrics
             if hasattr(func, '__name__'):
                 model_name = kwargs.get('model_name', 'unknown')
-                gpu_jobs_completed.labels(model_name=model_name).inc()
+                _bound_child(_jobs_completed_children, model_name).inc()
             
             return result
         except Exception as e:
             # Update failure metrics
             if hasattr(func, '__name__'):
                 model_name = kwargs.get('model_name', 'unknown')
-                gpu_jobs_failed.labels(model_name=model_name).inc()
+                _bound_child(_jobs_failed_children, model_name).inc()
             raise
     return wrapper
 
@@ -148,25 +305,50 @@ def start_metrics_server(port: int = 9400):
         logger.error(f"Failed to start metrics server: {str(e)}")
         raise
 
+async def _periodic_collect(metrics: GPUMetricsCollector, interval: float = 15.0):
+    """Start a collection every interval without waiting for the previous one to finish"""
+    in_flight: Optional[asyncio.Task] = None
+    try:
+        while True:
+            if in_flight is None or in_flight.done():
+                in_flight = asyncio.create_task(metrics.collect_metrics())
+            else:
+                # A slow RUNE response must not stretch the cadence; scrapes keep
+                # serving the last snapshot until it completes
+                logger.warning("Previous metrics collection still in flight, skipping cycle")
+            await asyncio.sleep(interval)
+    finally:
+        if in_flight is not None and not in_flight.done():
+            in_flight.cancel()
+
+@lru_cache(maxsize=1)
+def get_metrics_collector() -> GPUMetricsCollector:
+    """Get the process-wide metrics collector, creating it on first use"""
+    return GPUMetricsCollector(RuneSettings())
+
 async def setup_monitoring(metrics_port: int = 9400):
     """Setup monitoring system"""
+    metrics = None
+    housekeeping = None
     try:
         # Start Prometheus metrics server
         start_metrics_server(metrics_port)
         
-        # Initialize metrics collector
-        rune_settings = RuneSettings()
-        metrics = GPUMetricsCollector(rune_settings)
+        # Job gauges move on lifecycle hooks; a once-a-minute count seeds them
+        # and covers jobs that changed state while this process wasn't running
+        housekeeping = asyncio.create_task(_job_gauge_housekeeping(interval=60.0))
         
-        # Start periodic collection
-        while True:
-            await metrics.collect_metrics()
-            await asyncio.sleep(15)  # Collect every 15 seconds
+        # Get the shared metrics collector
+        metrics = get_metrics_collector()
+        
+        # Collect every 15 seconds in the background
+        await _periodic_collect(metrics, interval=15.0)
             
     except Exception as e:
         logger.error(f"Error in monitoring setup: {str(e)}")
         raise
-
-# Global metrics collector instance
-rune_settings = RuneSettings()
-metrics = GPUMetricsCollector(rune_settings)
+    finally:
+        if housekeeping is not None:
+            housekeeping.cancel()
+        if metrics is not None:
+            await metrics.aclose()
@@ -1,8 +1,12 @@
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import logging
 import asyncio
-from datetime import datetime, timedelta
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
 import aiohttp
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 import boto3
 from tenacity import retry, stop_after_attempt, wait_exponential
@@ -14,6 +18,35 @@ from .monitoring import monitor
 
 logger = logging.getLogger(__name__)
 
+# Statuses that occupy one of the max_spot_instances slots
+LIVE_SPOT_STATUSES = (GPUStatus.PROVISIONING, GPUStatus.AVAILABLE, GPUStatus.BUSY)
+
+# Connection pool shared by all provider clients. Created lazily because an
+# aiohttp session must be constructed inside a running event loop.
+_http_session: Optional[aiohttp.ClientSession] = None
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Return the shared provider HTTP session, creating it on first use"""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=20,
+                keepalive_timeout=75,
+                ttl_dns_cache=300,
+                enable_cleanup_closed=True
+            )
+        )
+    return _http_session
+
+async def close_http_session() -> None:
+    """Close the shared provider HTTP session"""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
 class SpotManager:
     def __init__(self, db: Session, config: Optional[Dict] = None):
         """
@@ -47,6 +80,23 @@ class SpotManager:
         self.max_spot_instances = self.config.get("max_spot_instances", 5)
         self.price_threshold = self.config.get("spot_price_threshold", 2.0)
         self.min_instance_lifetime = self.config.get("min_instance_lifetime", 3600)  # 1 hour
+        self.max_concurrent_status_checks = self.config.get("max_concurrent_status_checks", 32)
+        self.instance_ready_timeout = self.config.get("instance_ready_timeout", 600)  # 10 minutes
+        
+        # Offers change on human timescales, so bursts of provisioning
+        # requests share recent (and in-flight) provider lookups
+        self.offer_cache_ttl = self.config.get("offer_cache_ttl", 30)
+        self.offer_cache_size = self.config.get("offer_cache_size", 256)
+        self._offer_cache: Dict[Tuple[str, int, str], Tuple[float, List[Dict]]] = {}
+        self._offer_requests: Dict[Tuple[str, int, str], asyncio.Future] = {}
+        
+        # Live spot instance count kept in memory so provisioning doesn't
+        # COUNT(*) the table; decremented on every transition out of a live status
+        self._spot_count = self.db.query(func.count(GPU.id)).filter(
+            GPU.provider == GPUProvider.SPOT,
+            GPU.status.in_(LIVE_SPOT_STATUSES)
+        ).scalar() or 0
+        self._spot_count_lock = asyncio.Lock()
 
     @monitor
     async def provision_gpu(
@@ -57,27 +107,27 @@ class SpotManager:
     ) -> Optional[GPU]:
         """Provision a new spot GPU instance"""
         
-        # Check if we're at capacity
-        current_spots = self.db.query(GPU).filter(
-            GPU.provider == GPUProvider.SPOT
-        ).count()
+        # Check if we're at capacity and reserve a slot, so concurrent
+        # provisioning can't overshoot max_spot_instances
+        async with self._spot_count_lock:
+            if self._spot_count >= self.max_spot_instances:
+                logger.warning("Maximum spot instances reached")
+                return None
+            self._spot_count += 1
         
-        if current_spots >= self.max_spot_instances:
-            logger.warning("Maximum spot instances reached")
-            return None
-
-        # Get best price across providers
-        best_offer = await self._find_best_spot_offer(
-            min_memory=min_memory,
-            capabilities=capabilities,
-            max_price=max_price or self.price_threshold
-        )
-        
-        if not best_offer:
-            logger.warning("No suitable spot instances available")
-            return None
-
+        recorded = False
         try:
+            # Get best price across providers
+            best_offer = await self._find_best_spot_offer(
+                min_memory=min_memory,
+                capabilities=capabilities,
+                max_price=max_price or self.price_threshold
+            )
+            
+            if not best_offer:
+                logger.warning("No suitable spot instances available")
+                return None
+
             # Provision the instance
             provider = self.providers[best_offer["provider"]]
             instance_info = await provider.provision_instance(best_offer["instance_type"])
@@ -86,6 +136,7 @@ class SpotManager:
             gpu = GPU(
                 provider=GPUProvider.SPOT,
                 provider_id=instance_info["instance_id"],
+                provider_name=best_offer["provider"],
                 name=instance_info["gpu_name"],
                 status=GPUStatus.PROVISIONING,
                 total_memory=instance_info["total_memory"],
@@ -98,6 +149,7 @@ class SpotManager:
             
             self.db.add(gpu)
             self.db.commit()
+            recorded = True
             
             # Wait for instance to be ready
             await self._wait_for_instance(gpu)
@@ -105,7 +157,19 @@ class SpotManager:
             
         except Exception as e:
             logger.error(f"Failed to provision spot instance: {e}")
+            # A recorded GPU that never became ready would otherwise sit in
+            # PROVISIONING and hold its slot forever
+            if recorded and gpu.status in LIVE_SPOT_STATUSES:
+                try:
+                    self._retire(gpu, GPUStatus.OFFLINE)
+                except Exception as retire_error:
+                    self.db.rollback()
+                    logger.error(f"Failed to retire GPU {gpu.id}: {retire_error}")
             return None
+        finally:
+            # Release the reserved slot if no GPU record was created
+            if not recorded:
+                self._spot_count -= 1
 
     async def _find_best_spot_offer(
         self,
@@ -114,42 +178,104 @@ class SpotManager:
         max_price: float
     ) -> Optional[Dict]:
         """Find the best spot instance offer across providers"""
-        offers = []
+        # Query all providers in parallel; one failing provider doesn't block the others
+        results = await asyncio.gather(
+            *(
+                self._get_spot_offers(provider_name, min_memory, capabilities)
+                for provider_name in self.providers.keys()
+            ),
+            return_exceptions=True
+        )
         
-        # Gather offers from all providers
-        for provider_name, provider in self.providers.items():
-            try:
-                provider_offers = await provider.get_spot_offers(
-                    min_memory=min_memory,
-                    capabilities=capabilities
-                )
-                
-                for offer in provider_offers:
-                    if offer["price"] <= max_price:
-                        offers.append({
-                            "provider": provider_name,
-                            **offer
-                        })
-                        
-            except Exception as e:
-                logger.error(f"Error getting offers from {provider_name}: {e}")
-                
-        if not offers:
+        # Track the cheapest suitable offer as (price, provider, offer) and
+        # only build the merged dict for the winner
+        best = None
+        for provider_name, provider_offers in zip(self.providers.keys(), results):
+            # BaseException: a cancelled provider request comes back as CancelledError
+            if isinstance(provider_offers, BaseException):
+                logger.error(f"Error getting offers from {provider_name}: {provider_offers!r}")
+                continue
+            
+            for offer in provider_offers or []:
+                price = offer["price"]
+                if price <= max_price and (best is None or price < best[0]):
+                    best = (price, provider_name, offer)
+        
+        if best is None:
             return None
+        return {"provider": best[1], **best[2]}
+
+    async def _get_spot_offers(
+        self,
+        provider_name: str,
+        min_memory: int,
+        capabilities: Dict
+    ) -> List[Dict]:
+        """Get offers from a provider, reusing recent results and in-flight requests"""
+        key = (provider_name, min_memory, json.dumps(capabilities or {}, sort_keys=True, default=str))
+        
+        while True:
+            cached = self._offer_cache.get(key)
+            if cached and time.monotonic() - cached[0] < self.offer_cache_ttl:
+                return cached[1]
+            
+            # Single flight: concurrent callers wait on the request already running
+            pending = self._offer_requests.get(key)
+            if pending is None:
+                break
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The caller that owned the request was cancelled, not us;
+                # go round again and issue (or join) a fresh request
+                if pending.cancelled():
+                    continue
+                raise
+        
+        future = asyncio.get_running_loop().create_future()
+        self._offer_requests[key] = future
+        try:
+            offers = await self.providers[provider_name].get_spot_offers(
+                min_memory=min_memory,
+                capabilities=capabilities
+            ) or []
+            
+            if len(self._offer_cache) >= self.offer_cache_size:
+                self._offer_cache.clear()
+            self._offer_cache[key] = (time.monotonic(), offers)
             
-        # Return cheapest suitable offer
-        return min(offers, key=lambda x: x["price"])
+            future.set_result(offers)
+            return offers
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; don't warn when there are none
+            future.exception()
+            raise
+        finally:
+            del self._offer_requests[key]
 
     @retry(
-        stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=1, min=4, max=30)
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=1, max=8),
+        reraise=True
     )
+    async def _check_instance_status(self, gpu: GPU) -> Dict:
+        """Check instance status, retrying transient provider errors"""
+        provider = self.providers[gpu.provider_name]
+        return await provider.check_instance_status(gpu.provider_id)
+
     async def _wait_for_instance(self, gpu: GPU) -> bool:
         """Wait for spot instance to be ready"""
-        provider = self.providers[gpu.provider]
+        # Poll quickly at first and back off, so fast instances are detected
+        # early and slow ones don't hammer the provider API
+        delay = 2.0
+        deadline = time.monotonic() + self.instance_ready_timeout
         
         while True:
-            status = await provider.check_instance_status(gpu.provider_id)
+            status = await self._check_instance_status(gpu)
             
             if status["state"] == "ready":
                 gpu.status = GPUStatus.AVAILABLE
@@ -157,11 +283,27 @@ class SpotManager:
                 return True
                 
             elif status["state"] == "failed":
-                gpu.status = GPUStatus.OFFLINE
-                self.db.commit()
+                self._retire(gpu, GPUStatus.OFFLINE)
                 raise Exception(f"Instance failed to start: {status.get('error')}")
+            
+            if time.monotonic() >= deadline:
+                self._retire(gpu, GPUStatus.OFFLINE)
+                raise TimeoutError(
+                    f"Instance {gpu.provider_id} not ready after {self.instance_ready_timeout}s"
+                )
                 
-            await asyncio.sleep(10)
+            await asyncio.sleep(delay + random.uniform(0, delay * 0.1))
+            delay = min(delay * 1.5, 30.0)
+
+    def _retire(self, gpu: GPU, status: GPUStatus) -> None:
+        """Move a GPU out of service, commit, and free its slot if it held one"""
+        was_live = gpu.status in LIVE_SPOT_STATUSES
+        gpu.status = status
+        if status == GPUStatus.TERMINATING:
+            gpu.termination_time = datetime.now(timezone.utc)
+        self.db.commit()
+        if was_live:
+            self._spot_count = max(0, self._spot_count - 1)
 
     async def terminate_gpu(self, gpu: GPU):
         """Terminate a spot instance"""
@@ -169,12 +311,10 @@ class SpotManager:
             return
             
         try:
-            provider = self.providers[gpu.provider]
+            provider = self.providers[gpu.provider_name]
             await provider.terminate_instance(gpu.provider_id)
             
-            gpu.status = GPUStatus.TERMINATING
-            gpu.termination_time = datetime.utcnow()
-            self.db.commit()
+            self._retire(gpu, GPUStatus.TERMINATING)
             
         except Exception as e:
             logger.error(f"Error terminating spot instance {gpu.id}: {e}")
@@ -188,45 +328,87 @@ class SpotManager:
                     GPU.status.in_([GPUStatus.AVAILABLE, GPUStatus.BUSY])
                 ).all()
                 
-                for gpu in spot_gpus:
-                    provider = self.providers[gpu.provider]
-                    status = await provider.check_instance_status(gpu.provider_id)
+                # Poll every instance concurrently, bounded to respect provider rate limits
+                semaphore = asyncio.Semaphore(self.max_concurrent_status_checks)
+                
+                async def check_status(gpu: GPU) -> Dict:
+                    async with semaphore:
+                        provider = self.providers[gpu.provider_name]
+                        return await provider.check_instance_status(gpu.provider_id)
+                
+                statuses = await asyncio.gather(
+                    *(check_status(gpu) for gpu in spot_gpus),
+                    return_exceptions=True
+                )
+                
+                # Apply every state change first and commit them together,
+                # rather than one transaction per GPU
+                replacements = []
+                for gpu, status in zip(spot_gpus, statuses):
+                    if isinstance(status, Exception):
+                        logger.error(f"Error checking spot instance {gpu.id}: {status}")
+                        continue
                     
-                    if status.get("termination_notice"):
-                        logger.warning(f"Spot instance {gpu.id} scheduled for termination")
-                        # Handle graceful shutdown
-                        await self._handle_termination_notice(gpu)
-                        
-                    elif status["state"] == "failed":
-                        logger.error(f"Spot instance {gpu.id} failed")
-                        await self._handle_instance_failure(gpu)
+                    try:
+                        if status.get("termination_notice"):
+                            logger.warning(f"Spot instance {gpu.id} scheduled for termination")
+                            # Handle graceful shutdown
+                            self._handle_termination_notice(gpu)
+                            
+                        elif status["state"] == "failed":
+                            logger.error(f"Spot instance {gpu.id} failed")
+                            if self._handle_instance_failure(gpu):
+                                replacements.append(gpu)
+                    except Exception as e:
+                        logger.error(f"Error handling spot instance {gpu.id}: {e}")
+                
+                # Every polled GPU was live, so count slots from the statuses
+                # being committed: a handler may change one and then raise
+                retired = sum(1 for gpu in spot_gpus if gpu.status not in LIVE_SPOT_STATUSES)
+                try:
+                    self.db.commit()
+                except Exception:
+                    self.db.rollback()
+                    raise
+                # Only free slots once the status changes are persisted
+                self._spot_count = max(0, self._spot_count - retired)
+                
+                # Replacements commit their own records, so start them only
+                # once this batch is persisted
+                for gpu in replacements:
+                    await self.provision_gpu(
+                        min_memory=gpu.total_memory,
+                        capabilities=gpu.capabilities
+                    )
                         
             except Exception as e:
                 logger.error(f"Error monitoring spot instances: {e}")
                 
             await asyncio.sleep(60)  # Check every minute
 
-    async def _handle_termination_notice(self, gpu: GPU):
-        """Handle spot instance termination notice"""
+    async def close(self):
+        """Release provider connections"""
+        await close_http_session()
+
+    def _handle_termination_notice(self, gpu: GPU):
+        """Handle spot instance termination notice; the caller commits"""
         # Mark GPU as terminating
         gpu.status = GPUStatus.TERMINATING
-        gpu.termination_time = datetime.utcnow()
-        self.db.commit()
+        gpu.termination_time = datetime.now(timezone.utc)
         
         # Notify job manager to migrate jobs if needed
         # This would be implemented based on your job migration strategy
 
-    async def _handle_instance_failure(self, gpu: GPU):
-        """Handle spot instance failure"""
+    def _handle_instance_failure(self, gpu: GPU) -> bool:
+        """Handle spot instance failure; the caller commits
+        
+        Returns:
+            True if a replacement should be provisioned for the GPU's jobs
+        """
         gpu.status = GPUStatus.OFFLINE
-        self.db.commit()
         
         # Attempt to provision replacement if needed
-        if len(gpu.current_jobs) > 0:
-            await self.provision_gpu(
-                min_memory=gpu.total_memory,
-                capabilities=gpu.capabilities
-            )
+        return len(gpu.current_jobs) > 0
 
 class SFComputeProvider:
     """SFCompute.com API integration"""
@@ -243,7 +425,10 @@ class SFComputeProvider:
         # Get credentials from config or central settings
         self.api_key = config.get("api_key") or settings.cloud_providers.sfcompute_api_key.get_secret_value()
         self.api_url = config.get("api_url") or settings.cloud_providers.sfcompute_api_url
-        self.session = aiohttp.ClientSession()
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared, keep-alive provider HTTP session"""
+        return await get_http_session()
         
     async def get_spot_offers(self, min_memory: int, capabilities: Dict) -> List[Dict]:
         """
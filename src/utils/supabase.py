@@ -1,41 +1,156 @@
 from supabase import create_client, Client
 import os
-from typing import Optional
-from functools import lru_cache
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Literal, Optional, Tuple
+from jose import jwt
+
+logger = logging.getLogger(__name__)
+
+# Environment variable holding the API key for each kind of client
+_KEY_ENV = {
+    "anon": "NEXT_PUBLIC_SUPABASE_ANON_KEY",
+    "admin": "SUPABASE_SERVICE_ROLE_KEY",
+}
+
+# Process-wide clients by kind. Reads after the first call are a plain dict
+# lookup; the lock only guards construction.
+_clients: Dict[str, Client] = {}
+_client_lock = threading.Lock()
+
+def _build(kind: Literal["anon", "admin"]) -> Client:
+    with _client_lock:
+        client = _clients.get(kind)
+        if client is None:
+            # Read at build time, not import, so a .env loaded after this
+            # module is imported still applies; this runs once per kind
+            supabase_url = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
+            supabase_key = os.getenv(_KEY_ENV[kind])
+            
+            if not supabase_url or not supabase_key:
+                raise ValueError(
+                    f"Supabase URL and {_KEY_ENV[kind]} must be set in environment variables"
+                )
+            
+            client = _clients[kind] = create_client(supabase_url, supabase_key)
+    return client
+
+def _get(kind: Literal["anon", "admin"]) -> Client:
+    return _clients.get(kind) or _build(kind)
 
-@lru_cache()
 def get_supabase() -> Client:
     """
     Create and return a cached Supabase client instance.
     Uses the same environment variables as the main subconscious-systems project.
     """
-    supabase_url = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    supabase_key = os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    
-    if not supabase_url or not supabase_key:
-        raise ValueError("Supabase URL and key must be set in environment variables")
-    
-    return create_client(supabase_url, supabase_key)
+    return _get("anon")
 
-@lru_cache()
 def get_supabase_admin() -> Client:
     """
     Create and return a cached Supabase admin client instance.
     Uses service role key for admin operations.
     """
-    supabase_url = os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-    supabase_service_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    
-    if not supabase_url or not supabase_service_key:
-        raise ValueError("Supabase URL and service key must be set in environment variables")
-    
-    return create_client(supabase_url, supabase_service_key)
+    return _get("admin")
+
+def close_supabase() -> None:
+    """Release the HTTP connection pools held by the cached clients"""
+    with _client_lock:
+        for client in _clients.values():
+            # supabase-py has no close(); shut the httpx sessions of the
+            # sub-clients that were actually created
+            postgrest = getattr(client, "_postgrest", None)
+            auth = getattr(client, "auth", None)
+            for session in (
+                getattr(postgrest, "session", None),
+                getattr(auth, "_http_client", None)
+            ):
+                close = getattr(session, "close", None)
+                if close is None:
+                    continue
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning(f"Error closing Supabase session: {e}")
+        _clients.clear()
+
+# Access token -> (user_id, fetched_at, expires_at)
+_user_id_cache: Dict[str, Tuple[str, float, float]] = {}
+# Background refreshes by token; holding the task keeps it from being
+# garbage-collected before it finishes
+_user_id_refreshing: Dict[str, asyncio.Task] = {}
+USER_ID_CACHE_TTL = 300.0
+USER_ID_CACHE_SIZE = 10_000
+
+# create_client returns the sync client; its auth calls block on HTTP, so
+# they run in a worker thread instead of on the event loop
+async def _access_token(supabase: Client) -> Optional[str]:
+    session = await asyncio.to_thread(supabase.auth.get_session)
+    return session.access_token if session else None
+
+def _token_expiry(token: str, now: float) -> float:
+    """Monotonic cache expiry for a token: its exp claim, capped at the cache TTL"""
+    ttl = USER_ID_CACHE_TTL
+    try:
+        # Only used to bound the cache lifetime; Supabase verifies the token
+        exp = jwt.get_unverified_claims(token).get("exp")
+        if exp:
+            ttl = min(ttl, float(exp) - time.time())
+    except Exception:
+        pass
+    return now + ttl
+
+async def _fetch_user_id(supabase: Client, token: str) -> Optional[str]:
+    """Look up the user for a token and cache the result"""
+    response = await asyncio.to_thread(supabase.auth.get_user, token)
+    user_id = response.user.id if response and response.user else None
+    if user_id is not None:
+        now = time.monotonic()
+        if len(_user_id_cache) >= USER_ID_CACHE_SIZE:
+            # Evict the oldest entry
+            _user_id_cache.pop(next(iter(_user_id_cache)))
+        _user_id_cache[token] = (user_id, now, _token_expiry(token, now))
+    return user_id
+
+async def _refresh_user_id(supabase: Client, token: str) -> None:
+    try:
+        await _fetch_user_id(supabase, token)
+    except Exception:
+        # Leave the entry in place; it is dropped once it expires
+        pass
+    finally:
+        _user_id_refreshing.pop(token, None)
 
 # Convenience function to get authenticated user's ID
 async def get_user_id(supabase: Client) -> Optional[str]:
-    """Get the current authenticated user's ID"""
+    """Get the current authenticated user's ID
+    
+    Lookups are cached per access token until the token expires (at most
+    USER_ID_CACHE_TTL seconds). Past half its lifetime an entry is still
+    served, and refreshed from Supabase in the background.
+    """
     try:
-        response = await supabase.auth.get_user()
-        return response.user.id if response.user else None
+        token = await _access_token(supabase)
+        if token is None:
+            response = await asyncio.to_thread(supabase.auth.get_user)
+            return response.user.id if response and response.user else None
+        
+        entry = _user_id_cache.get(token)
+        if entry is not None:
+            user_id, fetched_at, expires_at = entry
+            now = time.monotonic()
+            if now < expires_at:
+                if (
+                    now - fetched_at > (expires_at - fetched_at) / 2
+                    and token not in _user_id_refreshing
+                ):
+                    _user_id_refreshing[token] = asyncio.create_task(
+                        _refresh_user_id(supabase, token)
+                    )
+                return user_id
+            del _user_id_cache[token]
+        
+        return await _fetch_user_id(supabase, token)
     except Exception:
         return None
@@ -0,0 +1,38 @@
+"""
+Timestamp helpers
+
+Formats wall-clock timestamps as ISO 8601 UTC strings without going through
+the deprecated datetime.utcnow(). Consecutive calls within the same
+millisecond reuse the previously formatted string.
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+# (millisecond, formatted string) of the last timestamp produced
+_last_formatted = (-1, "")
+
+def utc_isoformat(ns: Optional[int] = None) -> str:
+    """
+    Format a wall-clock timestamp as an ISO 8601 UTC string.
+    
+    Args:
+        ns (Optional[int]): Nanoseconds since the epoch. Defaults to now.
+        
+    Returns:
+        str: Timestamp with millisecond precision, e.g. 2025-03-04T12:00:00.000+00:00
+    """
+    global _last_formatted
+    
+    if ns is None:
+        ns = time.time_ns()
+    
+    ms = ns // 1_000_000
+    cached_ms, cached = _last_formatted
+    if ms == cached_ms:
+        return cached
+    
+    formatted = datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat(timespec='milliseconds')
+    _last_formatted = (ms, formatted)
+    return formatted
@@ -13,4 +13,10 @@ async def test_connection():
             await client.close()
 
 if __name__ == "__main__":
+    # Use the libuv event loop where available
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(test_connection())
@@ -1,46 +1,42 @@
-import psycopg2
+import asyncio
 from dotenv import load_dotenv
 import os
 
-# Load environment variables from .env
-load_dotenv()
+from src.utils.db_pool import get_pg_pool, close_pg_pool
 
-# Get database connection parameters from environment variables
-DATABASE_URL = os.getenv("DATABASE_URL")
+async def main():
+    # Get database connection parameters from environment variables
+    if not os.getenv("DATABASE_URL"):
+        print("Error: DATABASE_URL environment variable not set")
+        exit(1)
 
-if not DATABASE_URL:
-    print("Error: DATABASE_URL environment variable not set")
-    exit(1)
+    # Connect to the database
+    try:
+        print("Attempting to connect to database...")
+        pool = await get_pg_pool()
+        print("Connection successful!")
 
-# Connect to the database
-try:
-    print("Attempting to connect to database...")
-    connection = psycopg2.connect(DATABASE_URL)
-    print("Connection successful!")
-    
-    # Create a cursor to execute SQL queries
-    cursor = connection.cursor()
-    
-    # Example query
-    print("Executing test query...")
-    cursor.execute("SELECT NOW();")
-    result = cursor.fetchone()
-    print("Current Time:", result)
+        # Run both probes at once; each pool.fetchval acquires its own connection
+        print("Executing test queries...")
+        result, db_version = await asyncio.gather(
+            pool.fetchval("SELECT NOW()"),
+            pool.fetchval("SELECT version()")
+        )
+        print("Current Time:", result)
+        print("PostgreSQL version:", db_version)
 
-    # Test database version
-    cursor.execute("SELECT version();")
-    db_version = cursor.fetchone()
-    print("PostgreSQL version:", db_version)
+        await close_pg_pool()
+        print("Connection closed successfully.")
 
-    # Close the cursor and connection
-    cursor.close()
-    connection.close()
-    print("Connection closed successfully.")
+    except Exception as e:
+        print(f"Failed to connect: {e}")
+        print("\nTroubleshooting tips:")
+        print("1. Check if your .env file exists and contains the correct credentials")
+        print("2. Verify that you can connect to the database using psql or another tool")
+        print("3. Check if the database is accessible from your current network")
+        print("4. Verify that the database user has the necessary permissions")
 
-except Exception as e:
-    print(f"Failed to connect: {e}")
-    print("\nTroubleshooting tips:")
-    print("1. Check if your .env file exists and contains the correct credentials")
-    print("2. Verify that you can connect to the database using psql or another tool")
-    print("3. Check if the database is accessible from your current network")
-    print("4. Verify that the database user has the necessary permissions")
+if __name__ == "__main__":
+    # Load environment variables from .env
+    load_dotenv()
+    asyncio.run(main())
@@ -2,32 +2,49 @@
 Integration tests for monitoring API endpoints.
 """
 
+import json
 import pytest
-from fastapi.testclient import TestClient
+import pytest_asyncio
+import httpx
 from unittest.mock import patch, MagicMock
 import sys
 
 # Import the main FastAPI app
 from src.main import app
+from src.api import monitoring
 from src.utils import gpu_metrics
 
-client = TestClient(app)
+pytestmark = pytest.mark.asyncio
+
+@pytest_asyncio.fixture
+async def client():
+    """Async client calling the app in-process, without a thread or socket."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+@pytest.fixture(autouse=True)
+def _reset_gpu_metrics_cache():
+    """Each test sees its own patched GPU metrics, not a cached response."""
+    monitoring.reset_gpu_metrics_cache()
+    yield
+    monitoring.reset_gpu_metrics_cache()
 
 class TestMonitoringAPI:
     """Test suite for monitoring API endpoints."""
     
-    def test_health_check(self):
+    async def test_health_check(self, client):
         """Test health check endpoint."""
-        response = client.get("/api/v1/monitoring/health")
+        response = await client.get("/api/v1/monitoring/health")
         assert response.status_code == 200
         data = response.json()
         assert data["status"] == "healthy"
         assert "timestamp" in data
         assert "version" in data
     
-    def test_system_metrics(self):
+    async def test_system_metrics(self, client):
         """Test system metrics endpoint."""
-        response = client.get("/api/v1/monitoring/metrics")
+        response = await client.get("/api/v1/monitoring/metrics")
         assert response.status_code == 200
         data = response.json()
         assert "timestamp" in data
@@ -37,7 +54,7 @@ class TestMonitoringAPI:
         assert "disk" in data["system"]
     
     @patch('src.utils.gpu_metrics.get_formatted_gpu_metrics')
-    def test_gpu_metrics(self, mock_get_gpu_metrics):
+    async def test_gpu_metrics(self, mock_get_gpu_metrics, client):
         """Test GPU metrics endpoint."""
         # Mock the GPU metrics response
         mock_metrics = {
@@ -64,7 +81,7 @@ class TestMonitoringAPI:
         }
         mock_get_gpu_metrics.return_value = mock_metrics
         
-        response = client.get("/api/v1/monitoring/gpu-metrics")
+        response = await client.get("/api/v1/monitoring/gpu-metrics")
         assert response.status_code == 200
         data = response.json()
         
@@ -79,16 +96,45 @@ class TestMonitoringAPI:
         assert gpu["power_usage"] == 200.0
     
     @patch('src.utils.gpu_metrics.get_formatted_gpu_metrics')
-    def test_gpu_metrics_error_handling(self, mock_get_gpu_metrics):
+    async def test_gpu_metrics_error_handling(self, mock_get_gpu_metrics, client):
         """Test error handling in GPU metrics endpoint."""
         # Mock an exception
         mock_get_gpu_metrics.side_effect = Exception("Test error")
         
-        response = client.get("/api/v1/monitoring/gpu-metrics")
+        response = await client.get("/api/v1/monitoring/gpu-metrics")
         assert response.status_code == 500
         data = response.json()
         assert "detail" in data
         assert "Failed to get GPU metrics" in data["detail"]
+    
+    @patch('src.utils.gpu_metrics.get_formatted_gpu_metrics')
+    async def test_gpu_metrics_stream(self, mock_get_gpu_metrics):
+        """Test the GPU metrics SSE stream emits data and error events."""
+        # httpx's ASGITransport buffers the whole body, which never ends for
+        # an SSE stream, so read the response's body iterator directly
+        mock_get_gpu_metrics.side_effect = [
+            {"timestamp": "2025-03-04T12:00:00.000Z", "gpus": []},
+            Exception("Test error")
+        ]
+        
+        response = await monitoring.stream_gpu_metrics(interval=monitoring.GPU_METRICS_TTL)
+        assert response.media_type == "text/event-stream"
+        events = response.body_iterator
+        try:
+            first = await events.__anext__()
+            assert first.startswith(b"data: ")
+            assert json.loads(first[len(b"data: "):]) == {
+                "timestamp": "2025-03-04T12:00:00.000Z",
+                "gpus": []
+            }
+            
+            # Force the next event to poll again instead of reusing the cache
+            monitoring.reset_gpu_metrics_cache()
+            second = await events.__anext__()
+            assert second.startswith(b"event: error\ndata: ")
+            assert b"Test error" in second
+        finally:
+            await events.aclose()
 
 if __name__ == "__main__":
     pytest.main(["-xvs", __file__])
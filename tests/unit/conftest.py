@@ -0,0 +1,105 @@
+"""
+Shared fixtures for unit tests.
+
+The NVML mock is installed once per session so GPU code can be tested
+without GPU hardware.
+"""
+
+import pytest
+import sys
+
+# Create mock for pynvml module
+class MockPynvml:
+    NVML_TEMPERATURE_GPU = 0
+    NVML_CLOCK_GRAPHICS = 0
+    NVML_CLOCK_MEM = 1
+    
+    @staticmethod
+    def nvmlInit():
+        return None
+    
+    @staticmethod
+    def nvmlShutdown():
+        return None
+    
+    @staticmethod
+    def nvmlDeviceGetCount():
+        return 2
+    
+    @staticmethod
+    def nvmlDeviceGetHandleByIndex(index):
+        return f"handle-{index}"
+    
+    @staticmethod
+    def nvmlDeviceGetName(handle):
+        return b"NVIDIA GeForce RTX 3080"
+    
+    @staticmethod
+    def nvmlDeviceGetUUID(handle):
+        index = int(handle.split("-")[1])
+        return f"GPU-{index}".encode('utf-8')
+    
+    class MockUtilization:
+        def __init__(self):
+            self.gpu = 80
+            self.memory = 75
+    
+    # Shared read-only instances; tests never mutate them
+    _UTIL = MockUtilization()
+    
+    @staticmethod
+    def nvmlDeviceGetUtilizationRates(handle):
+        return MockPynvml._UTIL
+    
+    class MockMemory:
+        def __init__(self):
+            self.total = 10737418240  # 10 GB in bytes
+            self.used = 4294967296    # 4 GB in bytes
+            self.free = 6442450944    # 6 GB in bytes
+    
+    _MEM = MockMemory()
+    
+    @staticmethod
+    def nvmlDeviceGetMemoryInfo(handle):
+        return MockPynvml._MEM
+    
+    @staticmethod
+    def nvmlDeviceGetTemperature(handle, sensor_type):
+        return 70
+    
+    @staticmethod
+    def nvmlDeviceGetPowerUsage(handle):
+        return 200000  # 200 watts in milliwatts
+    
+    @staticmethod
+    def nvmlDeviceGetClockInfo(handle, clock_type):
+        if clock_type == MockPynvml.NVML_CLOCK_GRAPHICS:
+            return 1500
+        else:
+            return 7000
+
+@pytest.fixture(scope="session", autouse=True)
+def _mock_pynvml():
+    """Install MockPynvml as the pynvml module for the whole session."""
+    mock = MockPynvml()
+    previous = sys.modules.get('pynvml')
+    sys.modules['pynvml'] = mock
+    
+    # If gpu_metrics was imported before this fixture ran, point it at the mock
+    gpu_metrics = sys.modules.get('src.utils.gpu_metrics')
+    if gpu_metrics is not None:
+        gpu_metrics.pynvml = mock
+        gpu_metrics.NVML_AVAILABLE = True
+    
+    yield mock
+    
+    if previous is None:
+        del sys.modules['pynvml']
+    else:
+        sys.modules['pynvml'] = previous
+
+@pytest.fixture
+def gm(_mock_pynvml):
+    """The gpu_metrics module, imported against the NVML mock."""
+    from src.utils import gpu_metrics
+    return gpu_metrics
@@ -1,155 +1,87 @@
 """
 Unit tests for GPU metrics module.
 
-These tests can run without actual GPU hardware by mocking the NVML library.
+These tests can run without actual GPU hardware by mocking the NVML library
+(see conftest.py).
 """
 
 import pytest
-import sys
-from unittest.mock import patch, MagicMock
-from datetime import datetime
 
-# Create mock for pynvml module
-class MockPynvml:
-    NVML_TEMPERATURE_GPU = 0
-    NVML_CLOCK_GRAPHICS = 0
-    NVML_CLOCK_MEM = 1
-    
-    @staticmethod
-    def nvmlInit():
-        return None
-    
-    @staticmethod
-    def nvmlShutdown():
-        return None
-    
-    @staticmethod
-    def nvmlDeviceGetCount():
-        return 2
-    
-    @staticmethod
-    def nvmlDeviceGetHandleByIndex(index):
-        return f"handle-{index}"
-    
-    @staticmethod
-    def nvmlDeviceGetName(handle):
-        return b"NVIDIA GeForce RTX 3080"
-    
-    @staticmethod
-    def nvmlDeviceGetUUID(handle):
-        index = int(handle.split("-")[1])
-        return f"GPU-{index}".encode('utf-8')
-    
-    class MockUtilization:
-        def __init__(self):
-            self.gpu = 80
-            self.memory = 75
-    
-    @staticmethod
-    def nvmlDeviceGetUtilizationRates(handle):
-        return MockPynvml.MockUtilization()
-    
-    class MockMemory:
-        def __init__(self):
-            self.total = 10737418240  # 10 GB in bytes
-            self.used = 4294967296    # 4 GB in bytes
-            self.free = 6442450944    # 6 GB in bytes
-    
-    @staticmethod
-    def nvmlDeviceGetMemoryInfo(handle):
-        return MockPynvml.MockMemory()
-    
-    @staticmethod
-    def nvmlDeviceGetTemperature(handle, sensor_type):
-        return 70
-    
-    @staticmethod
-    def nvmlDeviceGetPowerUsage(handle):
-        return 200000  # 200 watts in milliwatts
-    
-    @staticmethod
-    def nvmlDeviceGetClockInfo(handle, clock_type):
-        if clock_type == MockPynvml.NVML_CLOCK_GRAPHICS:
-            return 1500
-        else:
-            return 7000
+# Preallocated so failing NVML stubs don't build a new exception per call
+_ERR = RuntimeError("Test error")
 
-# Add the mock to sys.modules
-sys.modules['pynvml'] = MockPynvml()
-
-# Now import the module to be tested
-from src.utils.gpu_metrics import (
-    initialize_nvml, shutdown_nvml, get_gpu_count, get_gpu_handle,
-    get_gpu_name, get_gpu_uuid, get_gpu_utilization, get_gpu_memory,
-    get_gpu_temperature, get_gpu_power_usage, get_gpu_clock_speeds,
-    get_all_gpu_metrics, get_formatted_gpu_metrics
-)
+def _raise(*args, **kwargs):
+    raise _ERR
 
 class TestGpuMetrics:
     """Test suite for GPU metrics module."""
     
-    def test_initialize_nvml(self):
+    def test_initialize_nvml(self, gm):
         """Test NVML initialization."""
-        assert initialize_nvml() is True
+        assert gm.initialize_nvml() is True
+        # Repeated calls are no-ops
+        assert gm.initialize_nvml() is True
     
-    def test_shutdown_nvml(self):
+    def test_shutdown_nvml(self, gm):
         """Test NVML shutdown."""
-        assert shutdown_nvml() is True
+        assert gm.shutdown_nvml() is True
+        # Repeated calls are no-ops
+        assert gm.shutdown_nvml() is True
     
-    def test_get_gpu_count(self):
+    def test_get_gpu_count(self, gm):
         """Test getting GPU count."""
-        assert get_gpu_count() == 2
+        assert gm.get_gpu_count() == 2
     
-    def test_get_gpu_handle(self):
+    def test_get_gpu_handle(self, gm):
         """Test getting GPU handle."""
-        handle = get_gpu_handle(0)
+        handle = gm.get_gpu_handle(0)
         assert handle == "handle-0"
     
-    def test_get_gpu_name(self):
+    def test_get_gpu_name(self, gm):
         """Test getting GPU name."""
-        handle = get_gpu_handle(0)
-        assert get_gpu_name(handle) == "NVIDIA GeForce RTX 3080"
+        handle = gm.get_gpu_handle(0)
+        assert gm.get_gpu_name(handle) == "NVIDIA GeForce RTX 3080"
     
-    def test_get_gpu_uuid(self):
+    def test_get_gpu_uuid(self, gm):
         """Test getting GPU UUID."""
-        handle = get_gpu_handle(0)
-        assert get_gpu_uuid(handle) == "GPU-0"
+        handle = gm.get_gpu_handle(0)
+        assert gm.get_gpu_uuid(handle) == "GPU-0"
     
-    def test_get_gpu_utilization(self):
+    def test_get_gpu_utilization(self, gm):
         """Test getting GPU utilization."""
-        handle = get_gpu_handle(0)
-        utilization = get_gpu_utilization(handle)
+        handle = gm.get_gpu_handle(0)
+        utilization = gm.get_gpu_utilization(handle)
         assert utilization["gpu"] == 80
         assert utilization["memory"] == 75
     
-    def test_get_gpu_memory(self):
+    def test_get_gpu_memory(self, gm):
         """Test getting GPU memory."""
-        handle = get_gpu_handle(0)
-        memory = get_gpu_memory(handle)
+        handle = gm.get_gpu_handle(0)
+        memory = gm.get_gpu_memory(handle)
         assert memory["total"] == 10240  # 10 GB in MB
         assert memory["used"] == 4096    # 4 GB in MB
         assert memory["free"] == 6144    # 6 GB in MB
     
-    def test_get_gpu_temperature(self):
+    def test_get_gpu_temperature(self, gm):
         """Test getting GPU temperature."""
-        handle = get_gpu_handle(0)
-        assert get_gpu_temperature(handle) == 70
+        handle = gm.get_gpu_handle(0)
+        assert gm.get_gpu_temperature(handle) == 70
     
-    def test_get_gpu_power_usage(self):
+    def test_get_gpu_power_usage(self, gm):
         """Test getting GPU power usage."""
-        handle = get_gpu_handle(0)
-        assert get_gpu_power_usage(handle) == 200.0
+        handle = gm.get_gpu_handle(0)
+        assert gm.get_gpu_power_usage(handle) == 200.0
     
-    def test_get_gpu_clock_speeds(self):
+    def test_get_gpu_clock_speeds(self, gm):
         """Test getting GPU clock speeds."""
-        handle = get_gpu_handle(0)
-        clock_speeds = get_gpu_clock_speeds(handle)
+        handle = gm.get_gpu_handle(0)
+        clock_speeds = gm.get_gpu_clock_speeds(handle)
         assert clock_speeds["graphics"] == 1500
         assert clock_speeds["memory"] == 7000
     
-    def test_get_all_gpu_metrics(self):
+    def test_get_all_gpu_metrics(self, gm):
         """Test getting metrics for all GPUs."""
-        metrics = get_all_gpu_metrics()
+        metrics = gm.get_all_gpu_metrics()
         assert len(metrics) == 2
         assert metrics[0]["id"] == "gpu-0"
         assert metrics[0]["name"] == "NVIDIA GeForce RTX 3080"
@@ -157,27 +89,53 @@ class TestGpuMetrics:
         assert metrics[0]["temperature"] == 70
         assert metrics[0]["power_usage"] == 200.0
     
-    def test_get_formatted_gpu_metrics(self):
+    def test_get_all_gpu_metrics_partial_failure(self, gm, monkeypatch):
+        """Test that one failing NVML query only zeroes its own field."""
+        monkeypatch.setattr('pynvml.nvmlDeviceGetTemperature', _raise)
+        metrics = gm.get_all_gpu_metrics()
+        assert len(metrics) == 2
+        assert metrics[0]["temperature"] == 0
+        assert metrics[0]["name"] == "NVIDIA GeForce RTX 3080"
+        assert metrics[0]["memory"]["total"] == 10240
+    
+    def test_get_formatted_gpu_metrics(self, gm):
         """Test getting formatted GPU metrics."""
-        metrics = get_formatted_gpu_metrics()
+        metrics = gm.get_formatted_gpu_metrics()
         assert "timestamp" in metrics
         assert "gpus" in metrics
         assert len(metrics["gpus"]) == 2
     
-    def test_error_handling(self):
+    def test_gpu_identity_cached(self, gm, monkeypatch):
+        """Test that handles and names are looked up once per device."""
+        gm.reset_gpu_cache()
+        handle = gm.get_gpu_handle(0)
+        gm.get_gpu_name(handle)
+        monkeypatch.setattr('pynvml.nvmlDeviceGetHandleByIndex', _raise)
+        monkeypatch.setattr('pynvml.nvmlDeviceGetName', _raise)
+        assert gm.get_gpu_handle(0) == handle
+        assert gm.get_gpu_name(handle) == "NVIDIA GeForce RTX 3080"
+    
+    def test_error_handling(self, gm, monkeypatch):
         """Test error handling when NVML functions fail."""
-        with patch('pynvml.nvmlDeviceGetCount', side_effect=Exception("Test error")):
-            assert get_gpu_count() == 0
+        # Handles and names are cached; start cold so the patches are hit
+        gm.reset_gpu_cache()
+        
+        with monkeypatch.context() as m:
+            m.setattr('pynvml.nvmlDeviceGetCount', _raise)
+            assert gm.get_gpu_count() == 0
         
-        with patch('pynvml.nvmlDeviceGetHandleByIndex', side_effect=Exception("Test error")):
-            assert get_gpu_handle(0) is None
+        with monkeypatch.context() as m:
+            m.setattr('pynvml.nvmlDeviceGetHandleByIndex', _raise)
+            assert gm.get_gpu_handle(0) is None
         
-        handle = get_gpu_handle(0)
-        with patch('pynvml.nvmlDeviceGetName', side_effect=Exception("Test error")):
-            assert get_gpu_name(handle) == "Unknown"
+        handle = gm.get_gpu_handle(0)
+        with monkeypatch.context() as m:
+            m.setattr('pynvml.nvmlDeviceGetName', _raise)
+            assert gm.get_gpu_name(handle) == "Unknown"
         
-        with patch('pynvml.nvmlDeviceGetMemoryInfo', side_effect=Exception("Test error")):
-            memory = get_gpu_memory(handle)
+        with monkeypatch.context() as m:
+            m.setattr('pynvml.nvmlDeviceGetMemoryInfo', _raise)
+            memory = gm.get_gpu_memory(handle)
             assert memory == {"total": 0, "used": 0, "free": 0}
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+"""
+Unit tests for spot instance slot accounting.
+
+Providers and the database session are mocked so no cloud or database
+access is needed.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("boto3")
+pytest.importorskip("sqlalchemy")
+
+from src.models.gpu import GPU, GPUStatus
+from src.utils.spot_manager import SpotManager
+
+pytestmark = pytest.mark.asyncio
+
+OFFER = {"provider": "vast", "instance_type": "a100", "price": 1.0}
+INSTANCE = {
+    "instance_id": "i-1",
+    "gpu_name": "A100",
+    "total_memory": 80,
+    "capabilities": {}
+}
+
+@pytest.fixture
+def manager():
+    """SpotManager with a mock session and provider, bypassing settings"""
+    mgr = SpotManager.__new__(SpotManager)
+    mgr.db = MagicMock()
+    mgr.max_spot_instances = 1
+    mgr.price_threshold = 2.0
+    mgr.instance_ready_timeout = 600
+    mgr._spot_count = 0
+    mgr._spot_count_lock = asyncio.Lock()
+    mgr._find_best_spot_offer = AsyncMock(return_value=OFFER)
+    provider = MagicMock()
+    provider.provision_instance = AsyncMock(return_value=INSTANCE)
+    mgr.providers = {"vast": provider}
+    return mgr
+
+class TestProvisionGpu:
+    """Test suite for provision_gpu slot accounting."""
+
+    async def test_status_check_error_releases_slot(self, manager):
+        """Test that a failing status check retires the GPU and frees its slot."""
+        manager._check_instance_status = AsyncMock(side_effect=RuntimeError("provider down"))
+
+        assert await manager.provision_gpu(min_memory=40, capabilities={}) is None
+
+        gpu = manager.db.add.call_args[0][0]
+        assert gpu.status == GPUStatus.OFFLINE
+        assert manager._spot_count == 0
+
+    async def test_ready_instance_keeps_slot(self, manager):
+        """Test that a ready instance keeps its reserved slot."""
+        manager._check_instance_status = AsyncMock(return_value={"state": "ready"})
+
+        gpu = await manager.provision_gpu(min_memory=40, capabilities={})
+
+        assert gpu.status == GPUStatus.AVAILABLE
+        assert manager._spot_count == 1
+
+class TestMonitorSpotInstances:
+    """Test suite for monitor_spot_instances slot accounting."""
+
+    async def test_handler_error_after_status_change_frees_slot(self, manager, monkeypatch):
+        """Test that a GPU retired by a handler that then raised still frees its slot."""
+        gpu = GPU(
+            provider_id="i-1",
+            provider_name="vast",
+            status=GPUStatus.AVAILABLE,
+            current_jobs=[]
+        )
+        manager._spot_count = 1
+        manager.max_concurrent_status_checks = 4
+        manager.db.query.return_value.filter.return_value.all.return_value = [gpu]
+        manager.providers["vast"].check_instance_status = AsyncMock(return_value={"state": "failed"})
+
+        def fail_after_retiring(gpu):
+            gpu.status = GPUStatus.OFFLINE
+            raise RuntimeError("notify failed")
+
+        manager._handle_instance_failure = fail_after_retiring
+        # End the loop after its first pass
+        monkeypatch.setattr(asyncio, "sleep", AsyncMock(side_effect=asyncio.CancelledError))
+
+        with pytest.raises(asyncio.CancelledError):
+            await manager.monitor_spot_instances()
+
+        assert manager._spot_count == 0
+        manager.db.commit.assert_called_once()
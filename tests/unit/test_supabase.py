@@ -0,0 +1,70 @@
+"""
+Unit tests for the Supabase helpers.
+
+A fake sync client stands in for supabase-py so no network access is needed.
+"""
+
+import time
+import pytest
+
+from src.utils import supabase as sb
+
+pytestmark = pytest.mark.asyncio
+
+class FakeAuth:
+    def __init__(self, token):
+        self.token = token
+        self.get_user_calls = 0
+
+    def get_session(self):
+        if self.token is None:
+            return None
+        return type("Session", (), {"access_token": self.token})()
+
+    def get_user(self, jwt=None):
+        self.get_user_calls += 1
+        user = type("User", (), {"id": "user-1"})()
+        return type("UserResponse", (), {"user": user})()
+
+class FakeClient:
+    def __init__(self, token="token-1"):
+        self.auth = FakeAuth(token)
+
+@pytest.fixture(autouse=True)
+def _clear_user_id_cache():
+    sb._user_id_cache.clear()
+    sb._user_id_refreshing.clear()
+    yield
+    sb._user_id_cache.clear()
+    sb._user_id_refreshing.clear()
+
+class TestGetUserId:
+    """Test suite for get_user_id caching."""
+
+    async def test_cached_per_token(self):
+        """Test that repeat lookups for a token hit the cache."""
+        client = FakeClient()
+
+        assert [await sb.get_user_id(client) for _ in range(3)] == ["user-1"] * 3
+        assert client.auth.get_user_calls == 1
+        assert "token-1" in sb._user_id_cache
+
+    async def test_stale_entry_served_and_refreshed(self):
+        """Test that a stale entry is returned while a refresh runs."""
+        client = FakeClient()
+        now = time.monotonic()
+        # Fetched 200s ago, expires in 100s: past half its lifetime
+        sb._user_id_cache["token-1"] = ("user-0", now - 200, now + 100)
+
+        assert await sb.get_user_id(client) == "user-0"
+        await sb._user_id_refreshing["token-1"]
+        assert client.auth.get_user_calls == 1
+        assert sb._user_id_cache["token-1"][0] == "user-1"
+        assert not sb._user_id_refreshing
+
+    async def test_no_session_not_cached(self):
+        """Test that lookups without a session token bypass the cache."""
+        client = FakeClient(token=None)
+
+        assert await sb.get_user_id(client) == "user-1"
+        assert not sb._user_id_cache